@@ -0,0 +1,119 @@
+import argparse
+import json
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from ClueGenerator import generate_clues
+from Main import (
+    GENERATOR_MODE,
+    MAX_ATTEMPTS,
+    CrosswordGenerator,
+    generate_best,
+    generate_valid_crossword,
+)
+from Lexicon import Lexicon
+from PuzzleStore import PuzzleWriter, encode_puzzle
+import Trace
+
+_words = None
+
+
+def _init_worker(word_file):
+    # Each worker process maps the lexicon cache once and reuses it for every
+    # puzzle it is handed.
+    global _words
+    _words = Lexicon.load(word_file)
+
+
+def generate_puzzle(seed, words=None, mode=GENERATOR_MODE, max_attempts=MAX_ATTEMPTS,
+                    best_of=1):
+    # Every puzzle gets its own seeded Random, so a puzzle can be reproduced
+    # from its seed no matter which worker produced it. With best_of > 1 the
+    # best of that many attempts is kept instead of the first good one.
+    if words is None:
+        words = _words
+
+    rng = random.Random(seed)
+    if best_of > 1:
+        grid, placed_words, attempts = generate_best(
+            words, attempts=best_of, budget=None, rng=rng,
+            generator=CrosswordGenerator(mode=mode))
+    else:
+        grid, placed_words, attempts = generate_valid_crossword(
+            words, max_attempts=max_attempts, mode=mode, rng=rng)
+
+    # Pool workers don't run atexit handlers, so counters go out per puzzle.
+    Trace.flush_counters()
+    return encode_puzzle(grid, placed_words, seed=seed, attempts=attempts)
+
+
+def add_cached_clues(puzzle):
+    # Fills in clues already in the clue cache; never sends a request.
+    horizontal_words = [w for w, _, _, d, _, _ in puzzle["words"] if d == "H"]
+    vertical_words = [w for w, _, _, d, _, _ in puzzle["words"] if d == "V"]
+    clues = generate_clues(horizontal_words, vertical_words, offline=True)
+    for entry in puzzle["words"]:
+        direction = "horizontal" if entry[3] == "H" else "vertical"
+        entry[5] = clues[direction].get(entry[0].lower(), entry[5])
+    return puzzle
+
+
+def generate_batch(word_file, count, seed=0, workers=None, mode=GENERATOR_MODE,
+                   chunksize=16, best_of=1):
+    # Yields puzzles in seed order as soon as each one is ready.
+    job = partial(generate_puzzle, mode=mode, best_of=best_of)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(word_file,),
+    ) as pool:
+        seeds = range(seed, seed + count)
+        for i, puzzle in enumerate(pool.map(job, seeds, chunksize=chunksize)):
+            puzzle["id"] = i
+            yield puzzle
+
+
+def write_jsonl(puzzles, out):
+    for puzzle in puzzles:
+        out.write(json.dumps(puzzle, separators=(",", ":")) + "\n")
+        out.flush()
+
+
+def write_store(puzzles, path):
+    # Writes an indexed puzzle file that the game and PuzzleReader load by id.
+    with PuzzleWriter(path) as writer:
+        for puzzle in puzzles:
+            writer.write(puzzle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate crossword grids headlessly as JSON Lines.")
+    parser.add_argument("-n", "--count", type=int, default=100)
+    parser.add_argument("-w", "--words", default="5k.txt")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("-m", "--mode", default=GENERATOR_MODE,
+                        choices=["greedy", "backtrack", "fill"])
+    parser.add_argument("-o", "--output", default="-",
+                        help="puzzle file, indexed for random access (default: stdout)")
+    parser.add_argument("-b", "--best-of", type=int, default=1,
+                        help="keep the best of this many attempts per puzzle")
+    parser.add_argument("--cached-clues", action="store_true",
+                        help="include clues already in the clue cache")
+    args = parser.parse_args(argv)
+
+    puzzles = generate_batch(args.words, args.count, seed=args.seed,
+                             workers=args.workers, mode=args.mode, best_of=args.best_of)
+    if args.cached_clues:
+        puzzles = map(add_cached_clues, puzzles)
+
+    if args.output == "-":
+        write_jsonl(puzzles, sys.stdout)
+    else:
+        write_store(puzzles, args.output)
+
+
+if __name__ == "__main__":
+    main()
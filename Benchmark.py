@@ -0,0 +1,241 @@
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from Lexicon import STREAM_PER_LENGTH, Lexicon
+from Main import (
+    MIN_PLACED_WORDS,
+    Grid,
+    find_overlap_positions,
+    generate_crossword,
+    generate_crossword_fill,
+    index_word,
+    pick_balanced_words,
+    place_first_word,
+    try_place_word,
+)
+from Placement import Placement
+
+MEMORY_SAMPLE = 50
+
+
+def _time_python(code, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_import(modules=("ClueGenerator", "Main"), runs=10):
+    # Median wall time of a fresh interpreter importing each module, minus
+    # the time of a bare interpreter start.
+    baseline = _time_python("pass", runs)
+    return {m: _time_python(f"import {m}", runs) - baseline for m in modules}
+
+
+def synthetic_lexicon(count, seed=0, source="10k.txt"):
+    # Random letter strings of length 3-10 drawn with the letter
+    # frequencies of `source`, so crossing behaviour resembles real words.
+    freqs = Lexicon.load(source).letter_frequencies()
+    letters, weights = zip(*freqs.items())
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(letters, weights, k=rng.randint(3, 10))))
+    return Lexicon.from_words(words)
+
+
+def load_lexicon(spec, seed=0):
+    # "5k.txt", "10k.txt", "synthetic:<count>" or "stream:<file>[:<per length>]"
+    # for a reservoir sample of a big or compressed list
+    if spec.startswith("synthetic:"):
+        return synthetic_lexicon(int(spec.split(":", 1)[1]), seed)
+    if spec.startswith("stream:"):
+        filename, _, per_length = spec[len("stream:"):].partition(":")
+        return Lexicon.stream(filename, int(per_length or STREAM_PER_LENGTH),
+                              rng=random.Random(seed))
+    return Lexicon.load(spec)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def _one_puzzle(words, seed, size, word_count, mode, stats=None, selection="random"):
+    rng = random.Random(seed)
+    if mode == "fill":
+        # Fill draws from the whole lexicon rather than a pick.
+        _, placed_words = generate_crossword_fill(words, word_count=word_count, rng=rng,
+                                                  size=size)
+        return [w for w, _ in placed_words], placed_words
+    chosen = pick_balanced_words(words, min_total=word_count, max_total=word_count, rng=rng,
+                                 selection=selection)
+    _, placed_words = generate_crossword(chosen, mode=mode, rng=rng, size=size, stats=stats)
+    return chosen, placed_words
+
+
+def bench_generate(words, size, word_count, puzzles=200, seed=0, mode="greedy",
+                   selection="random"):
+    latencies = []
+    successes = 0
+    placed_total = 0
+    stats = {}
+
+    start = time.perf_counter()
+    for i in range(puzzles):
+        t0 = time.perf_counter()
+        chosen, placed_words = _one_puzzle(words, seed + i, size, word_count, mode, stats,
+                                           selection)
+        latencies.append(time.perf_counter() - t0)
+
+        placed_total += len(placed_words)
+        if len(placed_words) >= min(MIN_PLACED_WORDS, len(chosen)):
+            successes += 1
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for i in range(min(puzzles, MEMORY_SAMPLE)):
+        _one_puzzle(words, seed + i, size, word_count, mode, selection=selection)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Share of all overlaps discarded before try_place_word, and of the
+    # ones tried, the share that didn't fit (greedy mode only).
+    pruned = stats.get("pruned_extent", 0) + stats.get("pruned_closed", 0)
+    considered = pruned + stats.get("candidates", 0)
+
+    latencies.sort()
+    return {
+        "size": size,
+        "words": word_count,
+        "mode": mode,
+        "selection": selection,
+        "puzzles": puzzles,
+        "puzzles_per_s": puzzles / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "success_rate": successes / puzzles,
+        "mean_placed": placed_total / puzzles,
+        "pruned_rate": pruned / max(1, considered),
+        "reject_rate": stats.get("rejected", 0) / max(1, stats.get("tried", 0)),
+        "peak_kb": peak / 1024,
+    }
+
+
+def bench_placement(words, size, word_count, samples=200, seed=0):
+    # Per-call cost of find_overlap_positions (with and without the letter
+    # index) and try_place_word, measured on grids halfway through a fill.
+    find_scan = find_index = place_time = 0.0
+    find_calls = place_calls = 0
+
+    for i in range(samples):
+        rng = random.Random(seed + i)
+        chosen = pick_balanced_words(words, min_total=word_count, max_total=word_count, rng=rng)
+        grid = Grid(size)
+        first, rest = chosen[0], chosen[1:]
+        r, c = place_first_word(grid, first)
+        placed_words = [Placement(first, r, c, "H")]
+        letter_index = {}
+        index_word(letter_index, first, (r, c, "H"))
+
+        half = len(rest) // 2
+        for w in rest[:half]:
+            for overlap in find_overlap_positions(w, placed_words, letter_index, grid):
+                res = try_place_word(grid, w, overlap)
+                if res:
+                    placed_words.append(Placement(w, *res))
+                    index_word(letter_index, w, res)
+                    break
+
+        for w in rest[half:]:
+            t0 = time.perf_counter()
+            find_overlap_positions(w, placed_words)
+            t1 = time.perf_counter()
+            overlaps = find_overlap_positions(w, placed_words, letter_index, grid)
+            t2 = time.perf_counter()
+            find_scan += t1 - t0
+            find_index += t2 - t1
+            find_calls += 1
+
+            for overlap in overlaps:
+                scratch = grid.copy()
+                t0 = time.perf_counter()
+                try_place_word(scratch, w, overlap)
+                place_time += time.perf_counter() - t0
+                place_calls += 1
+
+    return {
+        "size": size,
+        "words": word_count,
+        "find_scan_us": find_scan / max(1, find_calls) * 1e6,
+        "find_index_us": find_index / max(1, find_calls) * 1e6,
+        "try_place_us": place_time / max(1, place_calls) * 1e6,
+        "try_place_calls": place_calls,
+    }
+
+
+def _report(name, row, as_json):
+    if as_json:
+        print(json.dumps(dict(row, lexicon=name)))
+        return
+    fields = " ".join(
+        f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()
+    )
+    print(f"{name}: {fields}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crossword benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="module import time")
+    p_import.add_argument("modules", nargs="*", default=["ClueGenerator", "Main"])
+    p_import.add_argument("--runs", type=int, default=10)
+
+    for name, help_text in (("generate", "end-to-end puzzle generation"),
+                            ("placement", "overlap search and placement checks")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--words", nargs="+", default=["5k.txt", "10k.txt", "synthetic:100000"])
+        p.add_argument("--sizes", nargs="+", type=int, default=[15, 25])
+        p.add_argument("--counts", nargs="+", type=int, default=[12, 20])
+        p.add_argument("--puzzles", type=int, default=200)
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--json", action="store_true", help="one JSON object per result")
+        if name == "generate":
+            p.add_argument("--mode", default="greedy", choices=["greedy", "backtrack", "fill"])
+            p.add_argument("--selection", default="random", choices=["random", "crossable"])
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        for module, seconds in bench_import(args.modules, args.runs).items():
+            print(f"import {module}: {seconds * 1000:.1f} ms")
+        return
+
+    for spec in args.words:
+        words = load_lexicon(spec, args.seed)
+        for size in args.sizes:
+            for count in args.counts:
+                if args.command == "generate":
+                    row = bench_generate(words, size, count, args.puzzles, args.seed,
+                                         args.mode, args.selection)
+                else:
+                    row = bench_placement(words, size, count, args.puzzles, args.seed)
+                _report(spec, row, args.json)
+
+
+if __name__ == "__main__":
+    main()
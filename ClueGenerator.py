@@ -1,15 +1,172 @@
-import os
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
 
-load_dotenv(override=True)
-client = OpenAI()
+import Trace
 
-print("ENV KEY:", os.getenv("OPENAI_API_KEY"))
+CLUE_CACHE_PATH = "clues.sqlite3"
+CLUE_CACHE_TTL = 90 * 24 * 60 * 60
+CLUE_CACHE_MAX_ENTRIES = 50000
 
+CLUE_MODEL = "gpt-5-nano"
+CLUE_MAX_OUTPUT_TOKENS = 300
+CLUE_TOKENS_PER_WORD = 24
+CLUE_TOKENS_OVERHEAD = 50
+CLUE_CONCURRENCY = 4
+CLUE_RETRIES = 2
+CLUE_RETRY_DELAY = 0.5
+
+_default_cache = None
+_default_client = None
+_init_lock = threading.Lock()
+
+
+class ClueCache:
+    # Word -> clue store in SQLite. Entries expire after `ttl` seconds and
+    # the least recently used ones are evicted past `max_entries`; None
+    # turns either limit off. Pinned entries (pre-generated clues) never
+    # expire, aren't evicted and don't count towards max_entries.
+
+    def __init__(self, path=CLUE_CACHE_PATH, ttl=CLUE_CACHE_TTL,
+                 max_entries=CLUE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS clues ("
+                " word TEXT PRIMARY KEY,"
+                " clue TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " used REAL NOT NULL,"
+                " pinned INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(clues)")}
+            if "pinned" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE clues ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS clues_used ON clues (used)")
+
+    def get_many(self, words):
+        words = list({w.lower() for w in words})
+        if not words:
+            return {}
+
+        now = time.time()
+        oldest = float("-inf") if self.ttl is None else now - self.ttl
+        found = {}
+        with self._lock, self._conn:
+            for i in range(0, len(words), 500):
+                chunk = words[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT word, clue FROM clues WHERE word IN ({marks})"
+                    " AND (pinned OR created >= ?)",
+                    (*chunk, oldest),
+                ).fetchall()
+                found.update(rows)
+            self._conn.executemany(
+                "UPDATE clues SET used = ? WHERE word = ?",
+                [(now, w) for w in found],
+            )
+        return found
+
+    def put_many(self, clues, pinned=False):
+        # A pinned entry stays pinned when its clue is replaced.
+        if not clues:
+            return
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO clues (word, clue, created, used, pinned) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (word) DO UPDATE SET clue = excluded.clue,"
+                " created = excluded.created, used = excluded.used,"
+                " pinned = max(pinned, excluded.pinned)",
+                [(w.lower(), clue, now, now, int(pinned)) for w, clue in clues.items()],
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM clues WHERE created < ? AND NOT pinned",
+                               (now - self.ttl,))
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM clues WHERE word IN ("
+                " SELECT word FROM clues WHERE NOT pinned"
+                " ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM clues").fetchone()[0]
+
+
+class StubClient:
+    # Offline stand-in for OpenAI() with the same responses.create() shape.
+    # Answers with placeholder clues after `latency` seconds and fails a
+    # `failure_rate` fraction of calls, for benchmarks and offline runs.
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.responses = self
+
+    def create(self, model, input, **kwargs):
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("stub client failure")
+
+        answers = json.loads(input.split("INPUT WORDS:", 1)[1].split("OUTPUT:", 1)[0])
+        output = {
+            direction: {w: f"Stub clue, {len(w)} letters" for w in words}
+            for direction, words in answers.items()
+        }
+        return SimpleNamespace(output_text=json.dumps(output))
+
+
+def get_client():
+    # openai and dotenv are only imported, and the client only built, the
+    # first time a request actually has to go out.
+    global _default_client
+    with _init_lock:
+        if _default_client is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+
+            load_dotenv(override=True)
+            _default_client = OpenAI()
+    return _default_client
+
+
+def get_clue_cache():
+    global _default_cache
+    with _init_lock:
+        if _default_cache is None:
+            _default_cache = ClueCache()
+    return _default_cache
+
+
+def _request_clues(horizontal_words, vertical_words, client=None,
+                   max_output_tokens=CLUE_MAX_OUTPUT_TOKENS):
+    if client is None:
+        client = get_client()
 
-def generate_clues(horizontal_words, vertical_words):
     answers = {
         "horizontal": horizontal_words,
         "vertical": vertical_words,
@@ -34,18 +191,112 @@ Rules:
 - No markdown, no text outside JSON.
 """
 
-    resp = client.responses.create(
-        model="gpt-5-nano",
-        input=prompt,
-        max_output_tokens=300,
-        reasoning={ "effort": "minimal" },
-    )
+    with Trace.span("clue_request", words=len(horizontal_words) + len(vertical_words)):
+        resp = client.responses.create(
+            model=CLUE_MODEL,
+            input=prompt,
+            max_output_tokens=max_output_tokens,
+            reasoning={ "effort": "minimal" },
+        )
+
+    with Trace.span("clue_parse") as info:
+        raw = resp.output_text
+        info["chars"] = len(raw)
+
+        start = raw.find("{")
+        end = raw.rfind("}")
+        if start == -1 or end == -1:
+            raise ValueError("JSON not found in output.")
+
+        return json.loads(raw[start:end + 1])
+
+
+def clue_token_budget(word_count):
+    return CLUE_TOKENS_PER_WORD * word_count + CLUE_TOKENS_OVERHEAD
+
+
+def _chunk_words(items):
+    # Split (direction, word) pairs into chunks whose expected output fits
+    # in CLUE_MAX_OUTPUT_TOKENS, so no single reply gets truncated.
+    per_chunk = max(1, (CLUE_MAX_OUTPUT_TOKENS - CLUE_TOKENS_OVERHEAD) // CLUE_TOKENS_PER_WORD)
+    return [items[i:i + per_chunk] for i in range(0, len(items), per_chunk)]
+
+
+def _request_chunk(chunk, client):
+    horizontal_words = [w for direction, w in chunk if direction == "horizontal"]
+    vertical_words = [w for direction, w in chunk if direction == "vertical"]
+    fetched = _request_clues(horizontal_words, vertical_words, client=client,
+                             max_output_tokens=clue_token_budget(len(chunk)))
+
+    found = {"horizontal": {}, "vertical": {}}
+    for direction, w in chunk:
+        answers = {k.lower(): v for k, v in fetched.get(direction, {}).items()}
+        if w.lower() in answers:
+            found[direction][w.lower()] = answers[w.lower()]
+    return found
+
+
+@Trace.timed("generate_clues")
+def generate_clues(horizontal_words, vertical_words, cache=None, client=None,
+                   offline=False, on_partial=None):
+    # Only words missing from the clue cache are sent to the model, split
+    # into token-budgeted chunks that run concurrently. on_partial, if
+    # given, is called with each batch of clues as soon as it is known;
+    # only chunks that fail are retried. With offline=True missing words
+    # are left out instead, so no request is ever made.
+    if cache is None:
+        cache = get_clue_cache()
+
+    cached = cache.get_many(horizontal_words + vertical_words)
+
+    clues = {
+        "horizontal": {w.lower(): cached[w.lower()] for w in horizontal_words if w.lower() in cached},
+        "vertical": {w.lower(): cached[w.lower()] for w in vertical_words if w.lower() in cached},
+    }
+    if on_partial and cached:
+        on_partial({direction: dict(found) for direction, found in clues.items()})
+
+    missing = ([("horizontal", w) for w in horizontal_words if w.lower() not in cached]
+               + [("vertical", w) for w in vertical_words if w.lower() not in cached])
+    Trace.event("clue_cache", cached=len(cached), missing=len(missing))
+    if offline or not missing:
+        return clues
+
+    chunks = _chunk_words(missing)
+    pending = chunks
+    fetched_any = False
+    last_error = None
+
+    for attempt in range(CLUE_RETRIES + 1):
+        if attempt:
+            time.sleep(CLUE_RETRY_DELAY * attempt)
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=min(CLUE_CONCURRENCY, len(pending))) as pool:
+            futures = {pool.submit(_request_chunk, chunk, client): chunk for chunk in pending}
+            for future in as_completed(futures):
+                try:
+                    found = future.result()
+                except Exception as e:
+                    failed.append(futures[future])
+                    last_error = e
+                    Trace.count("clue_chunks_failed")
+                    continue
+
+                fetched_any = True
+                new_clues = {}
+                for direction in ("horizontal", "vertical"):
+                    clues[direction].update(found[direction])
+                    new_clues.update(found[direction])
+                cache.put_many(new_clues)
+                if on_partial:
+                    on_partial(found)
 
-    raw = resp.output_text
+        pending = failed
+        if not pending:
+            break
 
-    start = raw.find("{")
-    end = raw.rfind("}")
-    if start == -1 or end == -1:
-        raise ValueError("JSON not found in output.")
+    if pending and not fetched_any:
+        raise last_error
 
-    return json.loads(raw[start:end + 1])
+    return clues
@@ -0,0 +1,251 @@
+import bz2
+import gzip
+import io
+import lzma
+import math
+import mmap
+import os
+import random
+import struct
+from string import ascii_lowercase
+
+# Binary cache layout (little endian):
+#   header   magic, version, source mtime_ns, source size, min_len, max_len
+#   letters  26 x uint32 letter counts over the whole lexicon
+#   counts   one uint32 word count per length, min_len..max_len
+#   words    for each length, its words packed back to back as fixed-width
+#            ASCII records, so word i of length L sits at offset + i * L
+CACHE_SUFFIX = ".lexcache"
+CACHE_MAGIC = b"XWLX"
+CACHE_VERSION = 2
+HEADER = struct.Struct("<4sIqqBB")
+LETTERS = struct.Struct("<26I")
+
+# Words of each length kept by Lexicon.stream().
+STREAM_PER_LENGTH = 20000
+
+_loaded = {}
+
+
+def open_words(filename):
+    # Text stream over a word list, decompressing by suffix: .gz, .xz/.lzma,
+    # .bz2, or .zst/.zstd with the optional zstandard package. Undecodable
+    # bytes become U+FFFD, so such words fail the ASCII filter rather than
+    # turning into different words.
+    name = filename.lower()
+    if name.endswith(".gz"):
+        return gzip.open(filename, "rt", encoding="utf-8", errors="replace")
+    if name.endswith((".xz", ".lzma")):
+        return lzma.open(filename, "rt", encoding="utf-8", errors="replace")
+    if name.endswith(".bz2"):
+        return bz2.open(filename, "rt", encoding="utf-8", errors="replace")
+    if name.endswith((".zst", ".zstd")):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"reading {filename} needs the zstandard package") from None
+        # Multi-frame files (pzstd, concatenated streams) are read to the end.
+        raw = zstandard.ZstdDecompressor().stream_reader(
+            open(filename, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+    return open(filename, "r", encoding="utf-8", errors="replace")
+
+
+def iter_words(filename, min_len=3, max_len=10):
+    # Lowercase words from a (possibly compressed) list, one per line,
+    # filtered the way Lexicon.from_words() filters them. A generator, so
+    # the file is never held in memory.
+    with open_words(filename) as f:
+        for line in f:
+            w = line.strip()
+            if min_len <= len(w) <= max_len and w.isalpha() and w.isascii():
+                yield w.lower()
+
+
+class Lexicon:
+
+    def __init__(self, buckets, letter_counts, min_len, max_len):
+        # buckets: length -> (buffer of fixed-width records, word count)
+        self.buckets = buckets
+        self.letter_counts = letter_counts
+        self.min_len = min_len
+        self.max_len = max_len
+        # Built by PatternIndex.index_for() on first use.
+        self.pattern_index = None
+
+    @classmethod
+    def from_words(cls, words, min_len=3, max_len=10):
+        grouped = {length: [] for length in range(min_len, max_len + 1)}
+        letter_counts = [0] * 26
+        for w in words:
+            if min_len <= len(w) <= max_len and w.isalpha() and w.isascii():
+                w = w.lower()
+                grouped[len(w)].append(w)
+                for ch in w:
+                    letter_counts[ord(ch) - 97] += 1
+
+        buckets = {}
+        for length, bucket in grouped.items():
+            buckets[length] = (memoryview("".join(bucket).encode("ascii")), len(bucket))
+
+        return cls(buckets, letter_counts, min_len, max_len)
+
+    @classmethod
+    def load(cls, filename, min_len=3, max_len=10):
+        # Loaded once per process; the on-disk cache is rebuilt whenever the
+        # source file's mtime or size changes.
+        st = os.stat(filename)
+        key = (os.path.abspath(filename), st.st_mtime_ns, st.st_size, min_len, max_len)
+        if key in _loaded:
+            return _loaded[key]
+
+        cache_file = filename + CACHE_SUFFIX
+        lexicon = cls._read_cache(cache_file, st, min_len, max_len)
+        if lexicon is None:
+            lexicon = cls.from_words(iter_words(filename, min_len, max_len), min_len, max_len)
+            try:
+                lexicon._write_cache(cache_file, st)
+            except OSError:
+                pass
+
+        _loaded[key] = lexicon
+        return lexicon
+
+    @classmethod
+    def stream(cls, filename, per_length=STREAM_PER_LENGTH, min_len=3, max_len=10,
+               rng=None):
+        # At most per_length words of each length, drawn uniformly from the
+        # whole list in one pass (reservoir sampling). Memory is bounded by
+        # the sample, however big or compressed the source is. Repeats of a
+        # word still in the sample are skipped.
+        #
+        # Once a length's reservoir is full, Algorithm L computes how many
+        # words to skip before the next one that gets in, so most words
+        # cost a set lookup and a counter bump.
+        if per_length < 1:
+            raise ValueError(f"per_length must be at least 1, not {per_length}")
+        if rng is None:
+            rng = random
+        lengths = range(min_len, max_len + 1)
+        kept = {length: [] for length in lengths}
+        members = {length: set() for length in lengths}
+        seen = dict.fromkeys(lengths, 0)
+        next_in = dict.fromkeys(lengths, 1)
+        weight = dict.fromkeys(lengths, 1.0)
+
+        def skip(length):
+            # Advances next_in[length] to the next word that replaces one.
+            w = weight[length] * math.exp(math.log(1.0 - rng.random()) / per_length)
+            weight[length] = w
+            gap = math.log(1.0 - rng.random()) / math.log1p(-w) if w < 1.0 else 0.0
+            next_in[length] += int(gap) + 1
+
+        for w in iter_words(filename, min_len, max_len):
+            length = len(w)
+            if w in members[length]:
+                continue
+            n = seen[length] = seen[length] + 1
+            if n < next_in[length]:
+                continue
+            sample = kept[length]
+            if len(sample) < per_length:
+                sample.append(w)
+                members[length].add(w)
+                next_in[length] = n + 1
+                if n == per_length:
+                    next_in[length] = n
+                    skip(length)
+                continue
+            j = int(rng.random() * per_length)
+            members[length].discard(sample[j])
+            members[length].add(w)
+            sample[j] = w
+            skip(length)
+
+        return cls.from_words((w for sample in kept.values() for w in sample),
+                              min_len, max_len)
+
+    @classmethod
+    def _read_cache(cls, cache_file, st, min_len, max_len):
+        try:
+            with open(cache_file, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        counts_fmt = struct.Struct(f"<{max_len - min_len + 1}I")
+        try:
+            magic, version, mtime_ns, size, lo, hi = HEADER.unpack_from(data, 0)
+        except struct.error:
+            return None
+        if (magic != CACHE_MAGIC or version != CACHE_VERSION
+                or mtime_ns != st.st_mtime_ns or size != st.st_size
+                or lo != min_len or hi != max_len):
+            return None
+
+        # A short or padded file (interrupted write, corruption) is rebuilt.
+        offset = HEADER.size + LETTERS.size + counts_fmt.size
+        if len(data) < offset:
+            return None
+        counts = counts_fmt.unpack_from(data, HEADER.size + LETTERS.size)
+        if len(data) != offset + sum(length * count for length, count
+                                     in zip(range(min_len, max_len + 1), counts)):
+            return None
+
+        offset = HEADER.size
+        letter_counts = list(LETTERS.unpack_from(data, offset))
+        offset += LETTERS.size
+        counts = counts_fmt.unpack_from(data, offset)
+        offset += counts_fmt.size
+
+        view = memoryview(data)
+        buckets = {}
+        for length, count in zip(range(min_len, max_len + 1), counts):
+            end = offset + length * count
+            buckets[length] = (view[offset:end], count)
+            offset = end
+
+        return cls(buckets, letter_counts, min_len, max_len)
+
+    def _write_cache(self, cache_file, st):
+        lengths = range(self.min_len, self.max_len + 1)
+        counts_fmt = struct.Struct(f"<{len(lengths)}I")
+        tmp = cache_file + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, st.st_mtime_ns,
+                                st.st_size, self.min_len, self.max_len))
+            f.write(LETTERS.pack(*self.letter_counts))
+            f.write(counts_fmt.pack(*(self.buckets[length][1] for length in lengths)))
+            for length in lengths:
+                f.write(self.buckets[length][0])
+        os.replace(tmp, cache_file)
+
+    def __len__(self):
+        return sum(count for _, count in self.buckets.values())
+
+    def __iter__(self):
+        for length in range(self.min_len, self.max_len + 1):
+            data, count = self.buckets[length]
+            for i in range(count):
+                yield data[i * length:(i + 1) * length].tobytes().decode("ascii")
+
+    def letter_frequencies(self):
+        total = sum(self.letter_counts) or 1
+        return {ch: n / total for ch, n in zip(ascii_lowercase, self.letter_counts)}
+
+    def count(self, lo, hi):
+        return sum(self.buckets[length][1]
+                   for length in range(max(lo, self.min_len), min(hi, self.max_len) + 1))
+
+    def word_at(self, lo, hi, index):
+        # index runs across all words with lo <= len <= hi
+        for length in range(max(lo, self.min_len), min(hi, self.max_len) + 1):
+            data, count = self.buckets[length]
+            if index < count:
+                return data[index * length:(index + 1) * length].tobytes().decode("ascii")
+            index -= count
+        raise IndexError(index)
+
+    def sample(self, lo, hi, k, rng):
+        total = self.count(lo, hi)
+        return [self.word_at(lo, hi, i) for i in rng.sample(range(total), min(k, total))]
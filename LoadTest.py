@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+from Benchmark import percentile
+
+# Word lists for /clues requests. Few enough that concurrent clients keep
+# asking for the same ones, which is what request coalescing is for.
+CLUE_SETS = [
+    {"horizontal": ["apple", "river", "stone"], "vertical": ["cloud", "tiger"]},
+    {"horizontal": ["garden", "planet"], "vertical": ["orange", "window", "silver"]},
+    {"horizontal": ["music", "bridge", "candle"], "vertical": ["forest"]},
+]
+
+
+async def _read_response(reader):
+    # (status, body bytes); chunked bodies are reassembled.
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        body = b""
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+        return status, body
+
+    return status, await reader.readexactly(int(headers.get("content-length", 0)))
+
+
+def _request(method, path, host, body=b""):
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def _client(host, port, deadline, mix, rng, latencies, statuses):
+    # One keep-alive connection issuing requests back to back.
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+            if kind == "puzzle":
+                data = _request("GET", f"/puzzle?seed={rng.getrandbits(32)}&mode=greedy", host)
+            elif kind == "puzzle+clues":
+                data = _request("GET", f"/puzzle?seed={rng.getrandbits(32)}&mode=greedy&clues=1",
+                                host)
+            else:
+                body = json.dumps(rng.choice(CLUE_SETS)).encode("utf-8")
+                data = _request("POST", "/clues", host, body)
+
+            t0 = time.perf_counter()
+            writer.write(data)
+            await writer.drain()
+            status, _ = await _read_response(reader)
+            latencies.setdefault(kind, []).append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def _get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(_request("GET", path, host))
+    await writer.drain()
+    _, body = await _read_response(reader)
+    writer.close()
+    return json.loads(body)
+
+
+async def run_load(host, port, clients=32, duration=10.0, mix=None, seed=0):
+    if mix is None:
+        mix = {"puzzle": 6, "clues": 3, "puzzle+clues": 1}
+    rng = random.Random(seed)
+    latencies = {}
+    statuses = {}
+
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _client(host, port, deadline, mix, random.Random(rng.getrandbits(64)),
+                latencies, statuses)
+        for _ in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "clients": clients,
+        "seconds": round(elapsed, 2),
+        "requests": sum(statuses.values()),
+        "requests_per_s": round(sum(statuses.values()) / elapsed, 1),
+        "statuses": statuses,
+    }
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        report[kind] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+        }
+    report["server"] = await _get_json(host, port, "/stats")
+    return report
+
+
+async def _wait_until_up(host, port, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return await _get_json(host, port, "/health")
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for Server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-c", "--clients", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--mix", default="puzzle=6,clues=3,puzzle+clues=1",
+                        help="request kinds and weights")
+    parser.add_argument("--spawn", action="store_true",
+                        help="start Server.py --stub for the duration of the test")
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    mix = {}
+    for item in args.mix.split(","):
+        kind, _, weight = item.partition("=")
+        mix[kind] = float(weight or 1)
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([
+            sys.executable, "Server.py", "--stub", "--host", args.host,
+            "--port", str(args.port), "--stub-latency", str(args.stub_latency),
+        ])
+    try:
+        asyncio.run(_wait_until_up(args.host, args.port))
+        report = asyncio.run(run_load(args.host, args.port, args.clients,
+                                      args.duration, mix, args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
+import os
+import queue
 import random
+import sys
+import threading
+import time
 import tkinter as tk
 
+import Trace
 from ClueGenerator import generate_clues
+from Lexicon import Lexicon
+from PatternIndex import PatternIndex, index_for
+from Placement import Placement, WordMap
+from PuzzlePool import PuzzlePool
+from PuzzleStore import PuzzleReader, number_clues
 
 BASE_SCREEN_WIDTH = 2880
 BASE_SCREEN_HEIGHT = 1864
@@ -13,36 +24,115 @@ LETTER_FONT_SIZE = 25
 NUMBER_FONT_SIZE = 15
 GRID_PAD = 36     
 
-MIN_PLACED_WORDS = 5
-
-
-def pick_balanced_words(words, min_total=6, max_total=20):
-    short = [w for w in words if 3 <= len(w) <= 4]
-    medium = [w for w in words if 5 <= len(w) <= 6]
-    long = [w for w in words if 7 <= len(w) <= 10]
-
-    random.shuffle(short)
-    random.shuffle(medium)
-    random.shuffle(long)
+CLUE_PLACEHOLDER = "..."
+CLUE_POLL_MS = 50
 
-    total_target = random.randint(min_total, max_total)
+PUZZLE_POOL_SIZE = 3
 
-    want_short = random.randint(0, 1)
-    want_medium = random.randint(3, 4)
-    want_long = max(1, total_target - want_short - want_medium)
+SEED_ENV = "CROSSWORD_SEED"
 
-    chosen = []
-    chosen += short[:min(want_short, len(short))]
-    chosen += medium[:min(want_medium, len(medium))]
-    chosen += long[:min(want_long, len(long))]
-
-    while len(chosen) < total_target:
-        for bucket in [medium, long, short]:
-            if bucket:
-                chosen.append(bucket.pop())
-                break
+MIN_PLACED_WORDS = 5
 
-    random.shuffle(chosen)
+GENERATOR_MODE = "backtrack"
+BACKTRACK_MAX_NODES = 2000
+BACKTRACK_BRANCH = 3
+TARGET_DENSITY = 0.0
+MAX_OVERLAPS_PER_WORD = 200
+MAX_ATTEMPTS = 20
+BEST_OF_ATTEMPTS = 8
+BEST_OF_BUDGET = 0.5
+
+# (min length, max length, min wanted, max wanted) per bucket; a max of
+# None makes that bucket take whatever the target total leaves over.
+LENGTH_BUCKETS = ((3, 4, 0, 1), (5, 6, 3, 4), (7, 10, 1, None))
+# Buckets used, in order, to top up a pick that is still short.
+BUCKET_FILL_ORDER = (1, 2, 0)
+
+# "random" draws each bucket uniformly; "crossable" draws CROSSABLE_POOL
+# times as many candidates and keeps the ones sharing the most letters with
+# the rest of the candidates.
+WORD_SELECTION = "crossable"
+CROSSABLE_POOL = 2
+
+# "fill" mode: slots tried per open crossing cell, and lexicon matches
+# sampled per slot pattern.
+FILL_MAX_SLOTS = 40
+FILL_SAMPLE = 4
+
+
+def pick_crossable(pools, take, rng):
+    # Row sums of the pairwise shared-letter matrix over all candidates:
+    # sum over other candidates of |letters(a) & letters(b)|. That equals
+    # the sum, over a word's distinct letters, of how many candidates
+    # contain each letter, so it is computed from a 26-entry histogram in
+    # O(P) rather than O(P^2). Scores are per letter cell, so long words are
+    # not favoured just for having more letters, and scaled by a random
+    # factor so the same word set isn't picked every time.
+    letter_sets = [[set(w) for w in pool] for pool in pools]
+    hist = dict.fromkeys("abcdefghijklmnopqrstuvwxyz", 0)
+    for pool_sets in letter_sets:
+        for letters in pool_sets:
+            for ch in letters:
+                hist[ch] += 1
+
+    picked = []
+    for pool, pool_sets, k in zip(pools, letter_sets, take):
+        scored = []
+        for w, letters in zip(pool, pool_sets):
+            shared = sum(hist[ch] for ch in letters) - len(letters)
+            scored.append((shared / len(w) * (0.5 + rng.random()), w))
+        scored.sort(reverse=True)
+        picked += [w for _, w in scored[:k]]
+    return picked
+
+
+def bucket_lengths(buckets):
+    # Shortest and longest word length any bucket asks for.
+    return min(lo for lo, _, _, _ in buckets), max(hi for _, hi, _, _ in buckets)
+
+
+def pick_balanced_words(words, min_total=6, max_total=20, rng=None,
+                        buckets=LENGTH_BUCKETS, fill_order=BUCKET_FILL_ORDER,
+                        selection="random"):
+    if rng is None:
+        rng = random
+
+    min_len, max_len = bucket_lengths(buckets)
+    if not isinstance(words, Lexicon):
+        words = Lexicon.from_words(words, min_len, max_len)
+    elif min_len < words.min_len or max_len > words.max_len:
+        raise ValueError(
+            f"length buckets span {min_len}-{max_len} letters but the lexicon holds "
+            f"{words.min_len}-{words.max_len}; load it with min_len={min_len}, "
+            f"max_len={max_len}")
+
+    available = [words.count(lo, hi) for lo, hi, _, _ in buckets]
+
+    total_target = rng.randint(min_total, max_total)
+
+    wants = [None if want_max is None else rng.randint(want_min, want_max)
+             for _, _, want_min, want_max in buckets]
+    rest = total_target - sum(want for want in wants if want is not None)
+    wants = [max(bucket[2], rest) if want is None else want
+             for bucket, want in zip(buckets, wants)]
+
+    take = [min(want, avail) for want, avail in zip(wants, available)]
+
+    for b in fill_order:
+        extra = min(total_target - sum(take), available[b] - take[b])
+        if extra > 0:
+            take[b] += extra
+
+    if selection == "crossable":
+        pools = [words.sample(lo, hi, k * CROSSABLE_POOL, rng)
+                 for (lo, hi, _, _), k in zip(buckets, take)]
+        chosen = pick_crossable(pools, take, rng)
+    else:
+        chosen = []
+        for (lo, hi, _, _), k in zip(buckets, take):
+            chosen += words.sample(lo, hi, k, rng)
+
+    rng.shuffle(chosen)
     return chosen
 
 def is_normal_key(event):
@@ -68,30 +158,197 @@ def is_normal_key(event):
     return False
 
 
-def load_words(filename="words10k.txt"):
-    words = []
-    with open(filename, "r") as f:
-        for line in f:
-            w = line.strip().lower()
-            if 3 <= len(w) <= 10 and w.isalpha():
-                words.append(w)
-    return words
+class Grid:
+    # Flat bytearray of letters (0 = empty) plus one occupancy bitmask per
+    # row and per column, so a whole span can be validated with a few
+    # integer operations instead of a cell-by-cell walk.
 
+    def __init__(self, rows, cols=None):
+        if cols is None:
+            cols = rows
+        self.rows = rows
+        self.cols = cols
+        self.cells = bytearray(rows * cols)
+        self.row_bits = [0] * rows
+        self.col_bits = [0] * cols
 
-def empty_grid(n):
-    return [["#" for _ in range(n)] for _ in range(n)]
+    def get(self, r, c):
+        b = self.cells[r * self.cols + c]
+        return chr(b) if b else "#"
+
+    def to_list(self):
+        cols = self.cols
+        return [
+            ["#" if b == 0 else chr(b) for b in self.cells[r * cols:(r + 1) * cols]]
+            for r in range(self.rows)
+        ]
+
+    def can_place(self, word, row, col, direction):
+        rows, cols = self.rows, self.cols
+        length = len(word)
+
+        if direction == "H":
+            if row < 0 or row >= rows or col < 0 or col + length > cols:
+                return False
+            lines, n = self.row_bits, rows
+            line_no, start = row, col
+            base, step = row * cols, 1
+        else:
+            if col < 0 or col >= cols or row < 0 or row + length > rows:
+                return False
+            lines, n = self.col_bits, cols
+            line_no, start = col, row
+            base, step = col, cols
+
+        span = ((1 << length) - 1) << start
+        line = lines[line_no]
+
+        # Letters already on the span must agree with the word.
+        occupied = line & span
+        if occupied:
+            cells = self.cells
+            data = word.encode("ascii")
+            while occupied:
+                low = occupied & -occupied
+                k = low.bit_length() - 1
+                if cells[base + k * step] != data[k - start]:
+                    return False
+                occupied ^= low
+
+        # Newly filled cells may not touch a parallel neighbour.
+        side = 0
+        if line_no > 0:
+            side |= lines[line_no - 1]
+        if line_no + 1 < n:
+            side |= lines[line_no + 1]
+        if side & span & ~line:
+            return False
+
+        # Nothing directly before or after the word.
+        caps = ((span << 1) | (span >> 1)) & ~span
+        if line & caps:
+            return False
+
+        return True
+
+    def crossings(self, word, row, col, direction):
+        if direction == "H":
+            line, start = self.row_bits[row], col
+        else:
+            line, start = self.col_bits[col], row
+        span = ((1 << len(word)) - 1) << start
+        return bin(line & span).count("1")
+
+    def filled(self):
+        return sum(bin(bits).count("1") for bits in self.row_bits)
+
+    def copy(self):
+        other = Grid(self.rows, self.cols)
+        other.cells[:] = self.cells
+        other.row_bits[:] = self.row_bits
+        other.col_bits[:] = self.col_bits
+        return other
+
+    def place(self, word, row, col, direction):
+        # Returns the cells this word newly filled, for unplace().
+        cols = self.cols
+        dr, dc = (0, 1) if direction == "H" else (1, 0)
+        data = word.encode("ascii")
+        new_cells = []
+        for k, b in enumerate(data):
+            rr = row + dr * k
+            cc = col + dc * k
+            if not self.cells[rr * cols + cc]:
+                new_cells.append((rr, cc))
+            self.cells[rr * cols + cc] = b
+            self.row_bits[rr] |= 1 << cc
+            self.col_bits[cc] |= 1 << rr
+        return new_cells
+
+    def unplace(self, new_cells):
+        cols = self.cols
+        for rr, cc in new_cells:
+            self.cells[rr * cols + cc] = 0
+            self.row_bits[rr] &= ~(1 << cc)
+            self.col_bits[cc] &= ~(1 << rr)
+
+
+def choose_first_word(words, grid, rng):
+    # The first word goes across the middle row, so it must fit the width.
+    # None if no word does.
+    fits = [w for w in words if len(w) <= grid.cols]
+    return rng.choice(fits) if fits else None
 
 
 def place_first_word(grid, word):
-    row = GRID_SIZE // 2
-    col_start = (GRID_SIZE - len(word)) // 2
-    for i, ch in enumerate(word):
-        grid[row][col_start + i] = ch
+    row = grid.rows // 2
+    col_start = (grid.cols - len(word)) // 2
+    grid.place(word, row, col_start, "H")
     return (row, col_start)
 
 
-def find_overlap_positions(word, placed_words):
+def word_cells(word, pos):
+    r, c, direction = pos
+    if direction == "H":
+        return [(r, c + i) for i in range(len(word))]
+    return [(r + i, c) for i in range(len(word))]
+
+
+def index_word(letter_index, word, pos):
+    # letter -> {cell: (placed_word, (r, c, direction), offset)}, holding
+    # only the open crossing slots. A cell that two words share is already
+    # crossed in both directions, so it is closed: the old entry is removed
+    # and no new one is added. Returns the closed entries for unindex_word().
+    closed = []
+    for i, (ch, cell) in enumerate(zip(word, word_cells(word, pos))):
+        slots = letter_index.setdefault(ch, {})
+        if cell in slots:
+            closed.append((ch, cell, slots.pop(cell)))
+        else:
+            slots[cell] = (word, pos, i)
+    return closed
+
+
+def unindex_word(letter_index, word, pos, closed):
+    # Undoes index_word(); only valid in LIFO order, as in backtracking.
+    reopened = {cell for _, cell, _ in closed}
+    for ch, cell in zip(word, word_cells(word, pos)):
+        if cell not in reopened:
+            del letter_index[ch][cell]
+    for ch, cell, entry in closed:
+        letter_index[ch][cell] = entry
+
+
+def find_overlap_positions(word, placed_words, letter_index=None, grid=None,
+                           stats=None):
+    # With a grid, overlaps that would run the word off the grid are dropped
+    # here instead of being tried one by one; stats["pruned_extent"] counts
+    # them.
     positions = []
+    if letter_index is not None:
+        length = len(word)
+        rows = grid.rows if grid is not None else None
+        cols = grid.cols if grid is not None else None
+        pruned = 0
+        for j, ch in enumerate(word):
+            for placed_word, pos, i in letter_index.get(ch, {}).values():
+                if rows is not None:
+                    r, c, direction = pos
+                    if direction == "H":
+                        start = r - j
+                        if start < 0 or start + length > rows:
+                            pruned += 1
+                            continue
+                    else:
+                        start = c - j
+                        if start < 0 or start + length > cols:
+                            pruned += 1
+                            continue
+                positions.append((placed_word, pos, i, j))
+        if stats is not None:
+            stats["pruned_extent"] = stats.get("pruned_extent", 0) + pruned
+        return positions
+
     for placed_word, (r, c, direction) in placed_words:
         for i, ch1 in enumerate(placed_word):
             for j, ch2 in enumerate(word):
@@ -100,109 +357,564 @@ def find_overlap_positions(word, placed_words):
     return positions
 
 
-def try_place_word(grid, word, overlap):
+def overlap_position(overlap):
     _, (r, c, direction), i, j = overlap
 
     if direction == "H":
-        new_row = r - j
-        new_col = c + i
-
-        if new_row < 0 or new_row + len(word) > GRID_SIZE:
-            return False
-
-        for k, ch in enumerate(word):
-            rr = new_row + k
-            cc = new_col
-            cell = grid[rr][cc]
-
-            if cell not in ("#", ch):
-                return False
-
-            if cell == "#":
-                if cc - 1 >= 0 and grid[rr][cc - 1] != "#":
-                    return False
-                if cc + 1 < GRID_SIZE and grid[rr][cc + 1] != "#":
-                    return False
-
-        above = new_row - 1
-        below = new_row + len(word)
-        if above >= 0 and grid[above][new_col] != "#":
-            return False
-        if below < GRID_SIZE and grid[below][new_col] != "#":
-            return False
-
-        for k, ch in enumerate(word):
-            rr = new_row + k
-            cc = new_col
-            grid[rr][cc] = ch
-
-        return (new_row, new_col, "V")
-
+        return (r - j, c + i, "V")
     if direction == "V":
-        new_row = r + i
-        new_col = c - j
+        return (r + i, c - j, "H")
+    return None
 
-        if new_col < 0 or new_col + len(word) > GRID_SIZE:
-            return False
 
-        for k, ch in enumerate(word):
-            rr = new_row
-            cc = new_col + k
-            cell = grid[rr][cc]
+def iter_shuffled(items, rng):
+    # Lazy Fisher-Yates: yields items in random order, paying only for the
+    # ones the caller actually consumes.
+    n = len(items)
+    for i in range(n):
+        j = i + int(rng.random() * (n - i))
+        items[i], items[j] = items[j], items[i]
+        yield items[i]
 
-            if cell not in ("#", ch):
-                return False
 
-            if cell == "#":
-                if rr - 1 >= 0 and grid[rr - 1][cc] != "#":
-                    return False
-                if rr + 1 < GRID_SIZE and grid[rr + 1][cc] != "#":
-                    return False
-
-        left = new_col - 1
-        right = new_col + len(word)
-        if left >= 0 and grid[new_row][left] != "#":
-            return False
-        if right < GRID_SIZE and grid[new_row][right] != "#":
-            return False
+def try_place_word(grid, word, overlap):
+    pos = overlap_position(overlap)
+    if pos is None or not grid.can_place(word, *pos):
+        return False
 
-        for k, ch in enumerate(word):
-            rr = new_row
-            cc = new_col + k
-            grid[rr][cc] = ch
+    grid.place(word, *pos)
+    return pos
+
+def snapshot_state(grid, placed_words, rng, remaining=(), mode="greedy",
+                   max_overlaps=MAX_OVERLAPS_PER_WORD, **extra):
+    # A checkpoint of a generation in progress: the mode and its settings,
+    # placements, the words still to try and the RNG state, plus whatever
+    # else the mode needs (`extra`). Plain lists and numbers, so it can be
+    # written out as JSON and replayed in another process. The grid is
+    # rebuilt from the placements on restore.
+    version, internal, gauss_next = rng.getstate()
+    state = {
+        "mode": mode,
+        "max_overlaps": max_overlaps,
+        "rows": grid.rows,
+        "cols": grid.cols,
+        "placed_words": [[w, r, c, d] for w, (r, c, d) in placed_words],
+        "remaining": list(remaining),
+        "rng": [version, list(internal), gauss_next],
+    }
+    state.update(extra)
+    return state
 
-        return (new_row, new_col, "H")
 
-    return False
+def restore_rng(saved):
+    version, internal, gauss_next = saved
+    rng = random.Random()
+    rng.setstate((version, tuple(internal), gauss_next))
+    return rng
 
-def generate_crossword(words):
-    words = words[:]  
-    if not words:
-        return empty_grid(GRID_SIZE), []
 
-    grid = empty_grid(GRID_SIZE)
+def restore_state(state):
+    # Inverse of snapshot_state(): (grid, placed_words, rng, remaining).
+    grid = Grid(state["rows"], state["cols"])
+    placed_words = []
+    for w, r, c, d in state["placed_words"]:
+        grid.place(w, r, c, d)
+        placed_words.append(Placement(w, r, c, d))
+    return grid, placed_words, restore_rng(state["rng"]), list(state["remaining"])
+
+
+@Trace.timed("generate_crossword")
+def generate_crossword(words, mode="greedy", rng=None, size=None, cols=None,
+                       max_overlaps=MAX_OVERLAPS_PER_WORD, stats=None,
+                       checkpoint=None, resume=None):
+    # stats, if given, accumulates overlap counts: "candidates" reaching
+    # try_place_word, "tried", "rejected", and overlaps skipped before that
+    # because they ran off the grid ("pruned_extent") or used a crossing
+    # slot that is already closed ("pruned_closed").
+    #
+    # Greedy and backtracking modes: checkpoint, if given, is called with a
+    # snapshot_state() before each step (each word when greedy, each search
+    # step when backtracking); passing one of those back as `resume`
+    # carries on from that point (words, rng, mode and settings are then
+    # taken from it) and gives the same result as the uninterrupted run.
+    # Fill raises ValueError rather than ignore a checkpoint.
+    if resume is not None:
+        if resume.get("mode") == "backtrack":
+            return generate_crossword_backtracking(None, checkpoint=checkpoint,
+                                                   resume=resume)
+        if resume.get("mode") != "greedy":
+            raise ValueError(f"can't resume a {resume.get('mode')!r} snapshot")
+        return _generate_greedy(*restore_state(resume), resume["max_overlaps"], stats,
+                                checkpoint)
+    if checkpoint is not None and mode == "fill":
+        raise ValueError("fill mode can't be checkpointed")
+    if rng is None:
+        rng = random
+    if size is None:
+        size = GRID_SIZE
+
+    if mode == "backtrack":
+        return generate_crossword_backtracking(words, rng=rng, size=size, cols=cols,
+                                               checkpoint=checkpoint)
+    if mode == "fill":
+        # A pick is used once, so its index isn't cached.
+        return generate_crossword_fill(PatternIndex(words), word_count=len(words), rng=rng,
+                                       size=size, cols=cols)
 
-    first = random.choice(words)
+    words = words[:]  
+    grid = Grid(size, cols)
+    first = choose_first_word(words, grid, rng)
+    if first is None:
+        return grid.to_list(), []
     words.remove(first)
 
-    placed_words = []
     r, c = place_first_word(grid, first)
-    placed_words.append((first, (r, c, "H")))
+    rng.shuffle(words)
+    return _generate_greedy(grid, [Placement(first, r, c, "H")], rng, words, max_overlaps, stats,
+                            checkpoint)
 
-    random.shuffle(words)
 
-    for w in words:
-        overlaps = find_overlap_positions(w, placed_words)
-        random.shuffle(overlaps)
-        for overlap in overlaps:
+def _generate_greedy(grid, placed_words, rng, words, max_overlaps, stats, checkpoint):
+    # The word loop of generate_crossword(), from any point: placed_words
+    # are already on the grid and `words` are still to try, in order.
+    letter_index = {}
+    closed_per_letter = {}
+    for w, pos in placed_words:
+        for ch, _, _ in index_word(letter_index, w, pos):
+            closed_per_letter[ch] = closed_per_letter.get(ch, 0) + 1
+
+    trace = Trace.enabled
+    if stats is None and trace:
+        stats = {}
+    before = dict(stats) if trace else None
+
+    for k, w in enumerate(words):
+        if checkpoint is not None:
+            checkpoint(snapshot_state(grid, placed_words, rng, words[k:],
+                                      max_overlaps=max_overlaps))
+        overlaps = find_overlap_positions(w, placed_words, letter_index, grid, stats)
+        tried = 0
+        for overlap in iter_shuffled(overlaps, rng):
+            if tried >= max_overlaps:
+                break
+            tried += 1
             res = try_place_word(grid, w, overlap)
             if res:
-                placed_words.append((w, res))
+                placed_words.append(Placement(w, *res))
+                for ch, _, _ in index_word(letter_index, w, res):
+                    closed_per_letter[ch] = closed_per_letter.get(ch, 0) + 1
                 break
+        else:
+            res = None
+
+        if stats is not None:
+            rejected = tried - 1 if res else tried
+            stats["candidates"] = stats.get("candidates", 0) + len(overlaps)
+            stats["tried"] = stats.get("tried", 0) + tried
+            stats["rejected"] = stats.get("rejected", 0) + rejected
+            stats["pruned_closed"] = (stats.get("pruned_closed", 0)
+                                      + sum(closed_per_letter.get(ch, 0) for ch in w))
+            if trace:
+                Trace.event("place_word", word=w, overlaps=len(overlaps),
+                            tried=tried, rejected=rejected, placed=bool(res))
+
+    if trace:
+        for key, value in stats.items():
+            Trace.count("overlaps_" + key, value - before.get(key, 0))
+
+    return grid.to_list(), placed_words
+
+def score_grid(grid, placed_words):
+    # Placed words dominate, then crossings, then filled cells (density).
+    filled = grid.filled()
+    crossings = sum(len(w) for w, _ in placed_words) - filled
+    return (len(placed_words), crossings, filled)
+
+
+def generate_crossword_backtracking(words, min_placed=MIN_PLACED_WORDS,
+                                    target_density=TARGET_DENSITY,
+                                    max_nodes=BACKTRACK_MAX_NODES,
+                                    branch=BACKTRACK_BRANCH, rng=None, size=None,
+                                    cols=None, checkpoint=None, resume=None):
+    # checkpoint and resume work as in generate_crossword(). The search runs
+    # off an explicit stack rather than recursion, so a snapshot can carry
+    # it, the node count and the best placements so far; `words` and the
+    # other settings are then taken from the snapshot.
+    if resume is not None:
+        words = list(resume["remaining"])
+        rng = restore_rng(resume["rng"])
+        goal, min_filled = resume["goal"], resume["min_filled"]
+        max_nodes, branch = resume["max_nodes"], resume["branch"]
+        nodes = resume["nodes"]
+        best_score, best_placed = resume["best"]
+        best = [tuple(best_score), [Placement(*p) for p in best_placed]]
+        stack = [[k, [tuple(pos) for pos in cands], i, state, None]
+                 for k, cands, i, state in resume["stack"]]
+
+        # Replay the placements to get the grid, the letter index and the
+        # undo information of each frame that has its word placed.
+        grid = Grid(resume["rows"], resume["cols"])
+        placed_words = []
+        letter_index = {}
+        undo = []
+        for w, r, c, d in resume["placed_words"]:
+            new_cells = grid.place(w, r, c, d)
+            placed_words.append(Placement(w, r, c, d))
+            undo.append((new_cells, index_word(letter_index, w, (r, c, d))))
+        for frame, info in zip([f for f in stack if f[3] == "placed"], undo[1:]):
+            frame[4] = info
+    else:
+        if rng is None:
+            rng = random
+        if size is None:
+            size = GRID_SIZE
+
+        words = words[:]
+        grid = Grid(size, cols)
+        first = choose_first_word(words, grid, rng)
+        if first is None:
+            return grid.to_list(), []
+        words.remove(first)
+
+        placed_words = []
+        letter_index = {}
+        r, c = place_first_word(grid, first)
+        placed_words.append(Placement(first, r, c, "H"))
+        index_word(letter_index, first, (r, c, "H"))
+
+        rng.shuffle(words)
+
+        goal = min(min_placed, len(words) + 1)
+        min_filled = target_density * grid.rows * grid.cols
+        best = [score_grid(grid, placed_words), placed_words[:]]
+        nodes = 0
+        # One frame per word index being tried:
+        # [k, candidate positions, next candidate, state, undo], where state
+        # is "placed" while a candidate is on the grid (undo holds what
+        # grid.place() and index_word() returned for it), "skip" once every
+        # candidate has failed and word k is left out, else None.
+        stack = []
+
+    def candidates(w):
+        seen = set()
+        found = []
+        overlaps = find_overlap_positions(w, placed_words, letter_index, grid)
+        rng.shuffle(overlaps)
+        for overlap in overlaps:
+            pos = overlap_position(overlap)
+            if pos is None or pos in seen:
+                continue
+            seen.add(pos)
+            if grid.can_place(w, *pos):
+                found.append(pos)
+        found.sort(key=lambda pos: grid.crossings(w, *pos), reverse=True)
+        return found[:branch]
+
+    def enter(k):
+        # Visits the node for word k: True once a complete assignment meets
+        # the goal, False for a dead end, None once its frame is pushed.
+        nonlocal nodes
+        nodes += 1
+
+        score = score_grid(grid, placed_words)
+        if score > best[0]:
+            best[:] = [score, placed_words[:]]
+
+        if k == len(words):
+            return len(placed_words) >= goal and score[2] >= min_filled
+
+        if len(placed_words) + len(words) - k < goal:
+            return False
 
-    return grid, placed_words
+        stack.append([k, candidates(words[k]), 0, None, None])
+        return None
+
+    # Depth-first over the word list: each word is either placed at one of
+    # its best-scoring spots or skipped. Stops at the first complete
+    # assignment that meets the goal; otherwise keeps the best grid seen.
+    found = enter(0) if resume is None else None
+    while found is None:
+        if checkpoint is not None:
+            checkpoint(snapshot_state(
+                grid, placed_words, rng, words, mode="backtrack",
+                goal=goal, min_filled=min_filled, max_nodes=max_nodes, branch=branch,
+                nodes=nodes,
+                best=[list(best[0]), [[w, r, c, d] for w, (r, c, d) in best[1]]],
+                stack=[[k, [list(pos) for pos in cands], i, state]
+                       for k, cands, i, state, _ in stack]))
+
+        frame = stack[-1]
+        k, cands, i = frame[:3]
+        if nodes >= max_nodes:
+            stack.pop()
+            found = False
+        elif i < len(cands):
+            w, pos = words[k], cands[i]
+            frame[2] = i + 1
+            new_cells = grid.place(w, *pos)
+            placed_words.append(Placement(w, *pos))
+            frame[3:] = ["placed", (new_cells, index_word(letter_index, w, pos))]
+            found = enter(k + 1)
+        else:
+            frame[3] = "skip"
+            found = enter(k + 1)
+
+        # A dead end goes back up: a placed word is taken off again so its
+        # frame can try the next spot, and a skip fails its frame in turn.
+        while found is False and stack:
+            frame = stack[-1]
+            if frame[3] != "placed":
+                stack.pop()
+                continue
+            k, cands, i, _, (new_cells, closed) = frame
+            w, pos = words[k], cands[i - 1]
+            unindex_word(letter_index, w, pos, closed)
+            placed_words.pop()
+            grid.unplace(new_cells)
+            frame[3:] = [None, None]
+            found = None
+
+    if Trace.enabled:
+        Trace.event("backtrack", nodes=nodes, found=found, words=len(words) + 1)
+        Trace.count("backtrack_nodes", nodes)
+    if found:
+        return grid.to_list(), placed_words
+
+    best_placed = best[1]
+    best_grid = Grid(grid.rows, grid.cols)
+    for w, (r, c, d) in best_placed:
+        best_grid.place(w, r, c, d)
+    return best_grid.to_list(), best_placed
+
+
+def slot_pattern(grid, length, row, col, direction):
+    # The letters already on a slot, "?" for empty cells; None if the slot
+    # leaves the grid or lies along a word already there (two letters next
+    # to each other on it), which can_place() would let it extend.
+    rows, cols = grid.rows, grid.cols
+    if direction == "H":
+        if row < 0 or row >= rows or col < 0 or col + length > cols:
+            return None
+        occupied = grid.row_bits[row] >> col
+        step = 1
+    else:
+        if col < 0 or col >= cols or row < 0 or row + length > rows:
+            return None
+        occupied = grid.col_bits[col] >> row
+        step = cols
+    occupied &= (1 << length) - 1
+    if occupied & (occupied >> 1):
+        return None
+    start = row * cols + col
+    data = grid.cells[start:start + (length - 1) * step + 1:step]
+    return data.replace(b"\0", b"?").decode("ascii")
+
+
+@Trace.timed("generate_crossword_fill")
+def generate_crossword_fill(words, word_count=20, rng=None, size=None, cols=None,
+                            max_slots=FILL_MAX_SLOTS, sample=FILL_SAMPLE):
+    # Grows the grid slot by slot instead of word by word: pick an uncrossed
+    # letter, lay a slot of some length across it, and ask the pattern index
+    # which lexicon words fit the letters already there. `words` is the
+    # whole lexicon, or a PatternIndex over it, not a pick from it.
+    if rng is None:
+        rng = random
+    if size is None:
+        size = GRID_SIZE
+
+    index = words if isinstance(words, PatternIndex) else index_for(words)
+    grid = Grid(size, cols)
+    lengths = [n for n in sorted(index.words) if n <= max(grid.rows, grid.cols)]
+    if not lengths:
+        return grid.to_list(), []
+
+    across = [n for n in lengths if n <= grid.cols]
+    if not across:
+        return grid.to_list(), []
+    first_len = across[len(across) // 2]
+    first = index.sample("?" * first_len, 1, rng)[0]
+    r, c = place_first_word(grid, first)
+    placed_words = [Placement(first, r, c, "H")]
+    used = {first}
+
+    # Cells a new word may still cross, with the direction it would run in.
+    open_cells = [((r, c + i), "V") for i in range(len(first))]
+    crossed = set()
+    slots = [(n, j) for n in lengths for j in range(n)]
+
+    while open_cells and len(placed_words) < word_count:
+        k = int(rng.random() * len(open_cells))
+        open_cells[k], open_cells[-1] = open_cells[-1], open_cells[k]
+        (cr, cc), direction = open_cells.pop()
+        if (cr, cc) in crossed:
+            continue
+
+        res = None
+        tried = 0
+        for length, j in iter_shuffled(slots, rng):
+            if tried >= max_slots:
+                break
+            pos = (cr - j, cc, "V") if direction == "V" else (cr, cc - j, "H")
+            pattern = slot_pattern(grid, length, *pos)
+            # The pattern's own letters agree with the grid, so if it fits
+            # the slot, so does every word matching it.
+            if pattern is None or not grid.can_place(pattern, *pos):
+                continue
+            tried += 1
+            for w in index.sample(pattern, sample, rng):
+                if w not in used:
+                    res = (w, pos)
+                    break
+            if res:
+                break
+        if res is None:
+            continue
+
+        w, pos = res
+        new_cells = grid.place(w, *pos)
+        placed_words.append(Placement(w, *pos))
+        used.add(w)
+        fresh = set(new_cells)
+        other = "H" if pos[2] == "V" else "V"
+        for cell in word_cells(w, pos):
+            if cell in fresh:
+                open_cells.append((cell, other))
+            else:
+                crossed.add(cell)
+
+    if Trace.enabled:
+        Trace.event("fill", placed=len(placed_words), open=len(open_cells))
+    return grid.to_list(), placed_words
+
+
+class CrosswordGenerator:
+    # All generator settings in one object: grid dimensions, word-length
+    # buckets, target word count, placement goal and density.
+    #
+    # Complexity target (greedy mode): placing W words of length L costs
+    # O(W * (L * s + t)), where s is the number of placed letters sharing a
+    # letter with the word (one letter-index lookup each) and t the overlaps
+    # actually tried, capped at max_overlaps. A try is a constant number of
+    # bitmask operations on one row or column, independent of grid size.
+    # Overlap order is shuffled lazily, so untried overlaps cost nothing.
+    # In practice generation grows roughly linearly with W: 30x30 and
+    # 50x50 grids with 100+ words stay in the low milliseconds.
+    #
+    # Fill mode works the other way round: it picks open slots and asks the
+    # lexicon's PatternIndex for words matching the letters already there,
+    # at a few bitset ANDs per slot, so it fills max_words words whatever the
+    # lexicon size.
+
+    def __init__(self, rows=GRID_SIZE, cols=None, buckets=LENGTH_BUCKETS,
+                 fill_order=BUCKET_FILL_ORDER, min_words=6, max_words=20,
+                 min_placed=MIN_PLACED_WORDS, target_density=TARGET_DENSITY,
+                 mode=GENERATOR_MODE, max_overlaps=MAX_OVERLAPS_PER_WORD,
+                 max_attempts=MAX_ATTEMPTS, selection=WORD_SELECTION):
+        self.rows = rows
+        self.cols = rows if cols is None else cols
+        longest = bucket_lengths(buckets)[1]
+        if longest > max(self.rows, self.cols):
+            raise ValueError(f"buckets ask for words of up to {longest} letters, which "
+                             f"fit neither way on a {self.rows}x{self.cols} grid")
+        self.buckets = buckets
+        self.fill_order = fill_order
+        self.min_words = min_words
+        self.max_words = max_words
+        self.min_placed = min_placed
+        self.target_density = target_density
+        self.mode = mode
+        self.max_overlaps = max_overlaps
+        self.max_attempts = max_attempts
+        self.selection = selection
+
+    def load_lexicon(self, filename):
+        # The word list with every length the buckets ask for.
+        return Lexicon.load(filename, *bucket_lengths(self.buckets))
+
+    def pick_words(self, words, rng=None):
+        if self.mode == "fill":
+            # Fill draws from the whole lexicon through its pattern index.
+            return words
+        return pick_balanced_words(words, self.min_words, self.max_words, rng=rng,
+                                   buckets=self.buckets, fill_order=self.fill_order,
+                                   selection=self.selection)
+
+    def generate(self, words, rng=None, checkpoint=None):
+        # checkpoint as in generate_crossword(); resume a snapshot through
+        # generate_crossword(resume=...), which takes these settings from it.
+        if self.mode == "backtrack":
+            return generate_crossword_backtracking(
+                words, min_placed=self.min_placed, target_density=self.target_density,
+                rng=rng, size=self.rows, cols=self.cols, checkpoint=checkpoint)
+        if self.mode == "fill":
+            if checkpoint is not None:
+                raise ValueError("fill mode can't be checkpointed")
+            return generate_crossword_fill(words, word_count=self.max_words, rng=rng,
+                                           size=self.rows, cols=self.cols)
+        return generate_crossword(words, mode=self.mode, rng=rng, size=self.rows,
+                                  cols=self.cols, max_overlaps=self.max_overlaps,
+                                  checkpoint=checkpoint)
+
+    def is_good_enough(self, grid, placed_words, chosen_words):
+        if len(placed_words) < min(self.min_placed, len(chosen_words)):
+            return False
+        filled = sum(ch != "#" for row in grid for ch in row)
+        return filled >= self.target_density * self.rows * self.cols
+
+    def generate_valid(self, words, rng=None):
+        # Retries with a fresh word pick until the grid is good enough.
+        # Returns (grid, placed_words, attempts).
+        for attempt in range(self.max_attempts):
+            with Trace.span("attempt", attempt=attempt + 1) as info:
+                chosen_words = self.pick_words(words, rng=rng)
+                grid, placed_words = self.generate(chosen_words, rng=rng)
+                good = self.is_good_enough(grid, placed_words, chosen_words)
+                info.update(chosen=len(chosen_words), placed=len(placed_words), ok=good)
+
+            if good:
+                break
 
-def build_gui(grid, placed_words):
+        return grid, placed_words, attempt + 1
+
+
+def fetch_clues_async(root, horizontal_words, vertical_words, on_clues, on_done,
+                      clue_fn=generate_clues):
+    # Runs clue_fn on a worker thread; Tk is only touched from the main loop,
+    # which drains the partial results clue_fn reports through root.after,
+    # then the dict it returns. clue_fn must take on_partial, as
+    # generate_clues() does.
+    results = queue.Queue()
+
+    def worker():
+        try:
+            clue_data = clue_fn(horizontal_words, vertical_words, on_partial=results.put)
+            if clue_data:
+                results.put(clue_data)
+        except Exception as e:
+            print("Error generating clues, falling back to raw words:", e)
+        results.put(None)
+
+    def poll():
+        while True:
+            try:
+                clue_data = results.get_nowait()
+            except queue.Empty:
+                root.after(CLUE_POLL_MS, poll)
+                return
+            if clue_data is None:
+                on_done()
+                return
+            on_clues(clue_data)
+
+    threading.Thread(target=worker, daemon=True).start()
+    root.after(CLUE_POLL_MS, poll)
+
+
+def build_gui(grid, placed_words, clue_fn=generate_clues, clue_data=None,
+              next_puzzle=None):
+    # next_puzzle, if given, returns the next puzzle dict (see make_puzzle)
+    # and "play again" swaps it into this window instead of restarting.
+    build_start = time.perf_counter()
     root = tk.Tk()
     root.title("Crossword Puzzle")
     root.configure(bg="white")
@@ -216,7 +928,8 @@ def build_gui(grid, placed_words):
 
     scale = max(0.6, min(scale, 1.4))
 
-    cell_size = int(root.winfo_screenheight()/20)
+    base_cell_size = int(root.winfo_screenheight()/20)
+    cell_size = base_cell_size
     grid_pad = int(root.winfo_screenheight()/40)
     clues_pad_x = int(root.winfo_screenwidth() / 10)
 
@@ -243,164 +956,138 @@ def build_gui(grid, placed_words):
     grid_container.grid_rowconfigure(0, weight=1)
     grid_container.grid_rowconfigure(2, weight=1)
 
-    grid_frame = tk.Frame(grid_container, bg="white")
-    grid_frame.grid(row=1, column=1)
+    # One canvas draws the whole grid: a rectangle, a letter and an optional
+    # clue number per cell, with a single cursor outline for the focused cell.
+    # Its size follows the loaded grid; see load_puzzle().
+    pitch = cell_size + 4
+    grid_rows = grid_cols = GRID_SIZE
+    canvas = tk.Canvas(
+        grid_container,
+        width=GRID_SIZE * pitch,
+        height=GRID_SIZE * pitch,
+        bg="white",
+        highlightthickness=0,
+        takefocus=1,
+    )
+    canvas.grid(row=1, column=1)
 
     clues_frame = tk.Frame(main_frame, bg="white")
     clues_frame.pack(side="right", anchor="n", padx=clues_pad_x)
 
-    word_infos = []
-    cell_to_words = {}  
+    # Everything below is per-puzzle state, reset by load_puzzle().
+    puzzle_serial = 0
 
-    for w, (r, c, direction) in placed_words:
-        cells = []
-        if direction == "H":
-            for i, ch in enumerate(w):
-                cells.append((r, c + i))
-        else:  
-            for i, ch in enumerate(w):
-                cells.append((r + i, c))
-
-        idx = len(word_infos)
-        word_infos.append({
-            "word": w,
-            "direction": direction,
-            "cells": cells
-        })
-
-        for coord in cells:
-            cell_to_words.setdefault(coord, []).append(idx)
-
-    entries = []
+    placements = []
+    word_map = WordMap(0, 0, [])
+
+    letters = []
+    cell_rects = {}
+    cell_texts = {}
+    cursor = None
+    focus_cell = None
     active_word_idx = None
-    highlighted_cells = []
+    highlighted_cells = set()
 
     game_over = False
     overlay = None
     
+    # Solved state is kept up to date per keystroke: correct letters per
+    # word, letter cells still wrong, and the fill each cell currently has.
     solved_word_idxs = set()
-
-    start_cells = set(info["cells"][0] for info in word_infos)
-    sorted_starts = sorted(start_cells, key=lambda rc: (rc[0], rc[1]))
-    clue_numbers = {rc: i + 1 for i, rc in enumerate(sorted_starts)}
-
-    horizontal_words = [info["word"] for info in word_infos if info["direction"] == "H"]
-    vertical_words   = [info["word"] for info in word_infos if info["direction"] == "V"]
-    
-    loading_overlay = tk.Frame(root, bg="white")
-    loading_overlay.place(relx=0, rely=0, relwidth=1, relheight=1)
-
-    loading_label = tk.Label(
-        loading_overlay,
-        text="Generating...",
-        font=("Arial", 32, "bold"),
-        bg="white",
-        fg="black",
-    )
-    loading_label.place(relx=0.5, rely=0.5, anchor="center")
-
-    root.update()  
-
-
-
-    try:
-        clue_data = generate_clues(horizontal_words, vertical_words)
-    except Exception as e:
-        print("Error generating clues, falling back to raw words:", e)
-        clue_data = {
-            "horizontal": {w: w.upper() for w in horizontal_words},
-            "vertical": {w: w.upper() for w in vertical_words},
-        }
-
-    across_clues = []
-    down_clues = []
-
-    for info in word_infos:
-        start = info["cells"][0]
-        num = clue_numbers[start]
-        answer = info["word"]
-
-        if info["direction"] == "H":
-            clue_text = clue_data["horizontal"].get(answer, answer.upper())
-            across_clues.append((num, clue_text))
+    word_correct = []
+    remaining_cells = 0
+    cell_fills = {}
+
+    clue_numbers = {}
+    clue_labels = {}
+    pending_clues = set()
+
+    def set_focus(row, col):
+        nonlocal focus_cell
+        focus_cell = (row, col)
+        x0, y0 = col * pitch + 2, row * pitch + 2
+        canvas.coords(cursor, x0, y0, x0 + cell_size, y0 + cell_size)
+        canvas.itemconfig(cursor, state="normal")
+        canvas.tag_raise(cursor)
+        canvas.focus_set()
+
+    def clear_focus():
+        nonlocal focus_cell
+        focus_cell = None
+        canvas.itemconfig(cursor, state="hidden")
+
+    def paint_cell(rc):
+        if any(wi in solved_word_idxs for wi in word_map.at(*rc)):
+            fill = "#c8f7c5"
+        elif rc in highlighted_cells:
+            fill = "#e5f0ff"
         else:
-            clue_text = clue_data["vertical"].get(answer, answer.upper())
-            down_clues.append((num, clue_text))
+            fill = "white"
+        if cell_fills.get(rc) != fill:
+            canvas.itemconfig(cell_rects[rc], fill=fill)
+            cell_fills[rc] = fill
+
+    def set_letter(row, col, ch):
+        nonlocal remaining_cells
+        old = letters[row][col]
+        if old == ch:
+            return
+        letters[row][col] = ch
+        canvas.itemconfig(cell_texts[(row, col)], text=ch)
+
+        answer = grid[row][col].upper()
+        delta = (ch == answer) - (old == answer)
+        if not delta:
+            return
 
-    across_clues.sort(key=lambda x: x[0])
-    down_clues.sort(key=lambda x: x[0])
+        remaining_cells -= delta
+        for wi in word_map.at(row, col):
+            word_correct[wi] += delta
+            cells = placements[wi].cells()
+            solved = word_correct[wi] == len(cells)
+            if solved == (wi in solved_word_idxs):
+                continue
+            if solved:
+                solved_word_idxs.add(wi)
+            else:
+                solved_word_idxs.discard(wi)
+            for rc in cells:
+                paint_cell(rc)
 
     def move_focus(row, col, dr, dc):
         nr, nc = row + dr, col + dc
-        while 0 <= nr < GRID_SIZE and 0 <= nc < GRID_SIZE:
-            target = entries[nr][nc]
-            if target is not None:
-                target.focus_set()
+        while 0 <= nr < grid_rows and 0 <= nc < grid_cols:
+            if (nr, nc) in cell_rects:
+                set_focus(nr, nc)
                 return
             nr += dr
             nc += dc
 
     def is_word_filled(word_idx):
-        for (rr, cc) in word_infos[word_idx]["cells"]:
-            entry = entries[rr][cc]
-            if entry is None or entry.get().strip() == "":
+        for (rr, cc) in placements[word_idx].cells():
+            if letters[rr][cc] == "":
                 return False
         return True
     
-    def recompute_word_colors():
-        solved_word_idxs.clear()
-
-        for wi, info in enumerate(word_infos):
-            correct = True
-            for (rr, cc) in info["cells"]:
-                e = entries[rr][cc]
-                if e is None:
-                    correct = False
-                    break
-                text = e.get().strip().upper()
-                if text != grid[rr][cc].upper():
-                    correct = False
-                    break
-            if correct:
-                solved_word_idxs.add(wi)
-
-        for (rr, cc), indices in cell_to_words.items():
-            e = entries[rr][cc]
-            if e is None:
-                continue
-            if any(wi in solved_word_idxs for wi in indices):
-                e.config(bg="#c8f7c5") 
-            else:
-                e.config(bg="white")  
-
-
-
-    def clear_highlight():
-        highlighted_cells.clear()
-        recompute_word_colors()
-
     def highlight_word(idx):
-        if idx is None:
-            return
-
-        for (rr, cc) in word_infos[idx]["cells"]:
-            e = entries[rr][cc]
-            if e is None:
-                continue
-
-            indices = cell_to_words.get((rr, cc), [])
-            if any(wi in solved_word_idxs for wi in indices):
-                e.config(bg="#c8f7c5")
-            else:
-                e.config(bg="#e5f0ff")  
+        # Only cells entering or leaving the highlight are repainted.
+        new_cells = set(placements[idx].cells()) if idx is not None else set()
+        changed = highlighted_cells ^ new_cells
+        highlighted_cells.clear()
+        highlighted_cells.update(new_cells)
+        for rc in changed:
+            paint_cell(rc)
 
-            highlighted_cells.append((rr, cc))
+    def clear_highlight():
+        highlight_word(None)
 
 
 
 
-    def show_completion_overlay():
+    def show_completion_overlay(serial):
         nonlocal overlay, game_over
+        if game_over or serial != puzzle_serial:
+            return
         game_over = True
 
         overlay = tk.Frame(root, bg="white")
@@ -419,45 +1106,49 @@ def build_gui(grid, placed_words):
         def on_any_key(event):
             if not is_normal_key(event):
                 return 
-            root.destroy()
-            main()
+            if next_puzzle is None:
+                root.destroy()
+                main()
+                return
+            puzzle = next_puzzle()
+            load_puzzle(puzzle["grid"], puzzle["placed_words"], puzzle["clues"])
 
         overlay.bind("<Key>", on_any_key)
         overlay.focus_set()
 
     def check_puzzle():
+        if game_over or remaining_cells:
+            return
+        root.after(1200, show_completion_overlay, puzzle_serial)
+
+    def on_canvas_click(event):
         if game_over:
             return
-        for r in range(GRID_SIZE):
-            for c in range(GRID_SIZE):
-                correct = grid[r][c]
-                if correct == "#":
-                    continue
-                entry = entries[r][c]
-                if entry is None:
-                    return
-                text = entry.get().strip().upper()
-                if text != correct.upper():
-                    return
-        root.after(1200, show_completion_overlay)
+        row = int(canvas.canvasy(event.y) // pitch)
+        col = int(canvas.canvasx(event.x) // pitch)
+        if (row, col) in cell_rects:
+            set_focus(row, col)
+        else:
+            clear_focus()
+        on_cell_click(event, row, col)
 
     def on_cell_click(event, row, col):
         nonlocal active_word_idx
         if game_over:
             return
 
-        candidates = cell_to_words.get((row, col), [])
+        candidates = word_map.at(row, col)
         if not candidates:
             active_word_idx = None
             clear_highlight()
             return
 
         starts_here = [i for i in candidates
-                       if word_infos[i]["cells"][0] == (row, col)]
+                       if (placements[i].row, placements[i].col) == (row, col)]
         start_unfilled = [i for i in starts_here if not is_word_filled(i)]
 
         def choose_with_horizontal_preference(indices):
-            horiz = [i for i in indices if word_infos[i]["direction"] == "H"]
+            horiz = [i for i in indices if placements[i].direction == "H"]
             return horiz[0] if horiz else indices[0]
 
         if start_unfilled:
@@ -472,7 +1163,6 @@ def build_gui(grid, placed_words):
                 chosen = choose_with_horizontal_preference(candidates)
 
         active_word_idx = chosen
-        clear_highlight()
         highlight_word(active_word_idx)
 
 
@@ -480,20 +1170,28 @@ def build_gui(grid, placed_words):
         nonlocal active_word_idx
         if game_over:
             return
-        if isinstance(event.widget, tk.Entry):
+        if event.widget is canvas:
             return
         clear_highlight()
         active_word_idx = None
+        clear_focus()
         root.focus_set()
 
     root.bind("<Button-1>", on_root_click, add="+")
 
+    def on_canvas_key(event):
+        if focus_cell is None:
+            return "break"
+        if not Trace.enabled:
+            return on_key(event, *focus_cell)
+        with Trace.span("key", keysym=event.keysym):
+            return on_key(event, *focus_cell)
+
     def on_key(event, row, col):
         nonlocal active_word_idx
         if game_over:
             return "break"
 
-        entry = entries[row][col]
         key = event.keysym
         ch = event.char
 
@@ -511,10 +1209,10 @@ def build_gui(grid, placed_words):
             return "break"
 
         if key == "BackSpace":
-            entry.delete(0, tk.END)
+            set_letter(row, col, "")
 
             if active_word_idx is not None:
-                cells = word_infos[active_word_idx]["cells"]
+                cells = placements[active_word_idx].cells()
                 try:
                     idx = cells.index((row, col))
                 except ValueError:
@@ -522,14 +1220,7 @@ def build_gui(grid, placed_words):
 
                 if idx > 0:
                     pr, pc = cells[idx - 1]
-                    prev_entry = entries[pr][pc]
-                    if prev_entry is not None:
-                        prev_entry.focus_set()
-                        prev_entry.icursor(1)
-
-            recompute_word_colors()
-            if active_word_idx is not None:
-                highlight_word(active_word_idx)
+                    set_focus(pr, pc)
 
             return "break"
 
@@ -538,12 +1229,10 @@ def build_gui(grid, placed_words):
             return "break"
 
         if ch.isalpha():
-            upper = ch.upper()
-            entry.delete(0, tk.END)
-            entry.insert(0, upper)
+            set_letter(row, col, ch.upper())
 
             if active_word_idx is not None:
-                cells = word_infos[active_word_idx]["cells"]
+                cells = placements[active_word_idx].cells()
                 try:
                     idx = cells.index((row, col))
                 except ValueError:
@@ -551,14 +1240,7 @@ def build_gui(grid, placed_words):
 
                 if idx != -1 and idx + 1 < len(cells):
                     nr, nc = cells[idx + 1]
-                    next_entry = entries[nr][nc]
-                    if next_entry is not None:
-                        next_entry.focus_set()
-                        next_entry.icursor(1)
-
-            recompute_word_colors()
-            if active_word_idx is not None:
-                highlight_word(active_word_idx)
+                    set_focus(nr, nc)
 
             check_puzzle()
             return "break"
@@ -566,78 +1248,8 @@ def build_gui(grid, placed_words):
 
         return "break"
 
-    def on_focus_in(event):
-        event.widget.config(highlightthickness=THIN)
-
-    def on_focus_out(event):
-        event.widget.config(highlightthickness=THIN)
-
-    for r in range(GRID_SIZE):
-        row_entries = []
-        for c in range(GRID_SIZE):
-            if grid[r][c] == "#":
-                cell = tk.Label(
-                    grid_frame,
-                    width=2,
-                    height=1,
-                    bg="white",
-                    borderwidth=0,
-                    highlightthickness=0
-                )
-                cell.grid(row=r, column=c, padx=1, pady=1)
-                row_entries.append(None)
-            else:
-                cell_frame = tk.Frame(
-                    grid_frame,
-                    bg="white",
-                    width=cell_size,
-                    height=cell_size
-                )
-                cell_frame.grid(row=r, column=c, padx=2, pady=2)
-                cell_frame.grid_propagate(False)
-                cell_frame.pack_propagate(False)
-
-                var = tk.StringVar()
-                entry = tk.Entry(
-                    cell_frame,
-                    width=2,
-                    justify="center",
-                    textvariable=var,
-                    font=letter_font,
-                    bg="white",
-                    fg="black",
-                    relief="solid",
-                    borderwidth=1,
-                    highlightthickness=THIN,
-                    highlightbackground="white",
-                    highlightcolor="black",
-                    insertbackground="black",
-                )
-                entry.pack(fill="both", expand=True)
-
-                if (r, c) in clue_numbers:
-                    num = clue_numbers[(r, c)]
-                    num_label = tk.Label(
-                        cell_frame,
-                        text=str(num),
-                        font=number_font,
-                        bg="white",
-                        fg="black",
-                    )
-                    num_label.place(x=1, y=0, anchor="nw")
-
-                entry.bind("<FocusIn>", on_focus_in)
-                entry.bind("<FocusOut>", on_focus_out)
-
-                entry.bind("<Button-1>", lambda e, row=r, col=c: on_cell_click(e, row, col))
-                entry.bind("<KeyPress>", lambda e, row=r, col=c: on_key(e, row, col))
-
-                row_entries.append(entry)
-        entries.append(row_entries)
-
-    loading_label.destroy()
-    loading_overlay.destroy()
-
+    canvas.bind("<Button-1>", on_canvas_click)
+    canvas.bind("<KeyPress>", on_canvas_key)
 
     title = tk.Label(
         clues_frame,
@@ -657,15 +1269,8 @@ def build_gui(grid, placed_words):
     )
     across_label.pack(anchor="w", pady=(int(10 * scale), 0))
 
-    for num, word in across_clues:
-        lbl = tk.Label(
-            clues_frame,
-            text=f"{num}. {word}",
-            font=clue_font,
-            bg="white",
-            fg="black", 
-        )
-        lbl.pack(anchor="w")
+    across_frame = tk.Frame(clues_frame, bg="white")
+    across_frame.pack(anchor="w")
 
     down_label = tk.Label(
         clues_frame,
@@ -676,36 +1281,307 @@ def build_gui(grid, placed_words):
     )
     down_label.pack(anchor="w", pady=(int(10 * scale), 0))
 
-    for num, word in down_clues:
-        lbl = tk.Label(
-            clues_frame,
-            text=f"{num}. {word}",
-            font=clue_font,
-            bg="white",
-            fg="black", 
+    down_frame = tk.Frame(clues_frame, bg="white")
+    down_frame.pack(anchor="w")
+
+    def apply_clues(clue_data):
+        for direction in ("horizontal", "vertical"):
+            for answer, clue_text in clue_data.get(direction, {}).items():
+                key = (direction, answer.lower())
+                if key not in clue_labels:
+                    continue
+                lbl, num = clue_labels[key]
+                lbl.config(text=f"{num}. {clue_text}")
+                pending_clues.discard(key)
+
+    def finish_clues():
+        for direction, answer in pending_clues:
+            lbl, num = clue_labels[(direction, answer)]
+            lbl.config(text=f"{num}. {answer.upper()}")
+        pending_clues.clear()
+
+    @Trace.timed("load_puzzle")
+    def load_puzzle(new_grid, new_placed_words, clue_data=None):
+        nonlocal grid, puzzle_serial, placements, word_map, letters
+        nonlocal cell_rects, cell_texts, cursor, focus_cell, active_word_idx
+        nonlocal game_over, overlay, word_correct, remaining_cells, cell_fills
+        nonlocal clue_numbers, grid_rows, grid_cols, cell_size, pitch
+        nonlocal letter_font, number_font
+
+        puzzle_serial += 1
+        serial = puzzle_serial
+
+        if overlay is not None:
+            overlay.destroy()
+            overlay = None
+        game_over = False
+
+        grid = new_grid
+
+        # Larger grids shrink the cells so the whole puzzle stays on screen.
+        grid_rows, grid_cols = len(grid), len(grid[0]) if grid else 0
+        fit = (screen_h - 4 * grid_pad) // max(1, grid_rows, grid_cols) - 4
+        cell_size = max(12, min(base_cell_size, fit))
+        pitch = cell_size + 4
+        letter_font = ("Arial", max(6, int(cell_size / 2)))
+        number_font = ("Arial", max(5, int(cell_size / 4)))
+        canvas.config(width=grid_cols * pitch, height=grid_rows * pitch)
+
+        placements = [Placement(w, r, c, d) for w, (r, c, d) in new_placed_words]
+        word_map = WordMap(grid_rows, grid_cols, placements)
+
+        letters = [["" for _ in range(grid_cols)] for _ in range(grid_rows)]
+        focus_cell = None
+        active_word_idx = None
+        highlighted_cells.clear()
+
+        solved_word_idxs.clear()
+        word_correct = [0] * len(placements)
+        remaining_cells = word_map.filled()
+
+        clue_numbers = number_clues(new_placed_words)
+
+        horizontal_words = [p.word for p in placements if p.direction == "H"]
+        vertical_words   = [p.word for p in placements if p.direction == "V"]
+        
+        across_clues = []
+        down_clues = []
+
+        for p in placements:
+            num = clue_numbers[(p.row, p.col)]
+
+            if p.direction == "H":
+                across_clues.append((num, p.word))
+            else:
+                down_clues.append((num, p.word))
+
+        across_clues.sort(key=lambda x: x[0])
+        down_clues.sort(key=lambda x: x[0])
+
+        canvas.delete("all")
+        cell_rects = {}
+        cell_texts = {}
+        cell_fills = {}
+
+        for r in range(grid_rows):
+            for c in range(grid_cols):
+                if grid[r][c] == "#":
+                    continue
+
+                x0, y0 = c * pitch + 2, r * pitch + 2
+                cell_rects[(r, c)] = canvas.create_rectangle(
+                    x0, y0, x0 + cell_size, y0 + cell_size,
+                    fill="white",
+                    outline="black",
+                    width=1,
+                )
+                cell_fills[(r, c)] = "white"
+                cell_texts[(r, c)] = canvas.create_text(
+                    x0 + cell_size / 2, y0 + cell_size / 2,
+                    text="",
+                    font=letter_font,
+                    fill="black",
+                )
+
+                if (r, c) in clue_numbers:
+                    canvas.create_text(
+                        x0 + 3, y0 + 1,
+                        text=str(clue_numbers[(r, c)]),
+                        font=number_font,
+                        fill="black",
+                        anchor="nw",
+                    )
+
+        cursor = canvas.create_rectangle(
+            0, 0, 0, 0,
+            outline="black",
+            width=THIN + 1,
+            state="hidden",
         )
-        lbl.pack(anchor="w")
 
-    root.mainloop()
+        for frame in (across_frame, down_frame):
+            for child in frame.winfo_children():
+                child.destroy()
+        clue_labels.clear()
+
+        for frame, direction, clue_list in ((across_frame, "horizontal", across_clues),
+                                            (down_frame, "vertical", down_clues)):
+            for num, answer in clue_list:
+                lbl = tk.Label(
+                    frame,
+                    text=f"{num}. {CLUE_PLACEHOLDER}",
+                    font=clue_font,
+                    bg="white",
+                    fg="black", 
+                )
+                lbl.pack(anchor="w")
+                clue_labels[(direction, answer)] = (lbl, num)
 
+        pending_clues.clear()
+        pending_clues.update(clue_labels)
 
+        if clue_data is not None:
+            apply_clues(clue_data)
+            finish_clues()
+            return
 
+        # Clues still in flight for a previous puzzle are dropped.
+        def on_clues(clue_data):
+            if serial == puzzle_serial:
+                apply_clues(clue_data)
 
-def main():
-    words = load_words("5k.txt")
+        def on_done():
+            if serial == puzzle_serial:
+                finish_clues()
+
+        fetch_clues_async(root, horizontal_words, vertical_words,
+                          on_clues, on_done, clue_fn=clue_fn)
+
+    load_puzzle(grid, placed_words, clue_data)
 
-    for attempt in range(20):
-        chosen_words = pick_balanced_words(words)
-        grid, placed_words = generate_crossword(chosen_words)
+    if Trace.enabled:
+        Trace.event("build_gui", ms=round((time.perf_counter() - build_start) * 1000, 3))
+        root.after_idle(Trace.event, "window_ready")
 
-        if len(placed_words) >= min(MIN_PLACED_WORDS, len(chosen_words)):
+    root.mainloop()
+
+
+def generate_valid_crossword(words, max_attempts=MAX_ATTEMPTS, mode=GENERATOR_MODE, rng=None):
+    generator = CrosswordGenerator(mode=mode, max_attempts=max_attempts)
+    return generator.generate_valid(words, rng=rng)
+
+
+def puzzle_score(grid, placed_words):
+    # Placed words, then crossings, then compactness: the share of the
+    # words' bounding box that is filled.
+    cells = [(r, c) for r, row in enumerate(grid) for c, ch in enumerate(row) if ch != "#"]
+    if not cells:
+        return (0, 0, 0.0)
+    rows = [r for r, _ in cells]
+    cols = [c for _, c in cells]
+    box = (max(rows) - min(rows) + 1) * (max(cols) - min(cols) + 1)
+    crossings = sum(len(w) for w, _ in placed_words) - len(cells)
+    return (len(placed_words), crossings, len(cells) / box)
+
+
+def best_of_attempt(seed, words, generator):
+    # One independent attempt: its own seeded word pick and grid.
+    rng = random.Random(seed)
+    chosen = generator.pick_words(words, rng=rng)
+    grid, placed_words = generator.generate(chosen, rng=rng)
+    return seed, grid, placed_words
+
+
+def generate_best(words, attempts=BEST_OF_ATTEMPTS, budget=BEST_OF_BUDGET,
+                  generator=None, rng=None):
+    # Runs up to `attempts` independent attempts, one after another, and
+    # returns the best grid by puzzle_score() as (grid, placed_words,
+    # attempts_done). No new attempt starts once `budget` seconds have
+    # passed, though at least one always completes.
+    if attempts < 1:
+        raise ValueError(f"attempts must be at least 1, not {attempts}")
+    if rng is None:
+        rng = random
+    if generator is None:
+        generator = CrosswordGenerator()
+
+    deadline = None if budget is None else time.perf_counter() + budget
+    seeds = [rng.getrandbits(64) for _ in range(attempts)]
+    results = []
+    for seed in seeds:
+        results.append(best_of_attempt(seed, words, generator))
+        if deadline is not None and time.perf_counter() >= deadline:
             break
 
+    # Ties go to the earliest seed.
+    order = {seed: i for i, seed in enumerate(seeds)}
+    _, grid, placed_words = max(
+        results, key=lambda res: (puzzle_score(res[1], res[2]), -order[res[0]]))
+
+    if Trace.enabled:
+        Trace.event("generate_best", attempts=len(results), cancelled=attempts - len(results),
+                    score=puzzle_score(grid, placed_words))
+    return grid, placed_words, len(results)
+
+
+def make_puzzle(words, clue_fn=generate_clues, rng=None):
+    # A fully prepared puzzle: grid, placements and (unless clue_fn is None)
+    # clues, ready to be swapped into the window.
+    grid, placed_words, _ = generate_best(words, rng=rng)
+
+    clue_data = None
+    if clue_fn is not None:
+        horizontal_words = [w for w, (_, _, d) in placed_words if d == "H"]
+        vertical_words = [w for w, (_, _, d) in placed_words if d == "V"]
+        try:
+            clue_data = clue_fn(horizontal_words, vertical_words)
+        except Exception as e:
+            print("Error generating clues for pooled puzzle:", e)
+
+    return {"grid": grid, "placed_words": placed_words, "clues": clue_data}
+
+
+def print_word_bank(placed_words):
     print("\nWord Bank:")
     for w, pos in placed_words:
         print("-", w)
 
-    build_gui(grid, placed_words)
+
+def play_stored(puzzle_file, rng=None):
+    # Serves random puzzles from a file written by BatchGenerate, so no
+    # generation happens at play time.
+    if rng is None:
+        rng = random
+
+    with PuzzleReader(puzzle_file) as reader:
+        if not len(reader):
+            raise ValueError(f"{puzzle_file} holds no puzzles")
+
+        def next_puzzle():
+            puzzle = reader[rng.randrange(len(reader))]
+            print_word_bank(puzzle["placed_words"])
+            return puzzle
+
+        puzzle = next_puzzle()
+        build_gui(puzzle["grid"], puzzle["placed_words"], clue_data=puzzle["clues"],
+                  next_puzzle=next_puzzle)
+
+
+def main():
+    # Set CROSSWORD_SEED to replay a session; otherwise a seed is picked
+    # and printed.
+    seed = os.environ.get(SEED_ENV)
+    seed = int(seed) if seed else random.randrange(2 ** 32)
+    print("Seed:", seed)
+    rng = random.Random(seed)
+
+    if len(sys.argv) > 1:
+        play_stored(sys.argv[1], rng=rng)
+        return
+
+    with Trace.span("load_words", file="5k.txt"):
+        words = Lexicon.load("5k.txt")
+
+    with Trace.span("first_puzzle") as info:
+        grid, placed_words, info["attempts"] = generate_best(words, rng=rng)
+    print_word_bank(placed_words)
+
+    # The pool thread gets its own stream, so its puzzles don't depend on
+    # what the GUI thread draws meanwhile.
+    pool_rng = random.Random(rng.getrandbits(64))
+    pool = PuzzlePool(lambda: make_puzzle(words, rng=pool_rng), size=PUZZLE_POOL_SIZE)
+
+    def next_puzzle():
+        # Always the pool's next puzzle, waiting for it if need be, so a seed
+        # replays the same sequence however fast the player is.
+        puzzle = pool.get()
+        print_word_bank(puzzle["placed_words"])
+        return puzzle
+
+    try:
+        build_gui(grid, placed_words, next_puzzle=next_puzzle)
+    finally:
+        pool.stop()
 
 
 if __name__ == "__main__":
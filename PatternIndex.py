@@ -0,0 +1,141 @@
+from Lexicon import Lexicon
+
+WILDCARDS = "?."
+
+# Plain word lists whose index index_for() keeps; a Lexicon keeps its own.
+INDEX_CACHE_SIZE = 4
+
+# sample() probes at random while at least one word in this many matches;
+# below that it draws from a run of SAMPLE_POOL * k matches.
+SAMPLE_DENSITY = 8
+SAMPLE_POOL = 4
+
+
+class PatternIndex:
+    # Answers slot patterns such as "?a??e" ("?" or "." for an unknown
+    # letter) with the words of that length that fit.
+    #
+    # Words are grouped by length and numbered. For every (length, position,
+    # letter) there is one int used as a bitset over those numbers, so a
+    # query is one AND per known letter of the pattern, whatever the size of
+    # the lexicon; listing the matches costs one step per match.
+
+    def __init__(self, words, min_len=3, max_len=10):
+        # Words are filtered and lowercased as Lexicon.from_words() does; a
+        # Lexicon brings its own length range.
+        if isinstance(words, Lexicon):
+            min_len, max_len = words.min_len, words.max_len
+
+        grouped = {}
+        for w in words:
+            if min_len <= len(w) <= max_len and w.isalpha() and w.isascii():
+                grouped.setdefault(len(w), []).append(w.lower())
+
+        self.words = {}
+        self.bits = {}
+        self.all = {}
+        for length, group in grouped.items():
+            group = sorted(set(group))
+            nbytes = (len(group) + 7) // 8
+            raw = [[bytearray(nbytes) for _ in range(26)] for _ in range(length)]
+            for i, w in enumerate(group):
+                byte, bit = i >> 3, 1 << (i & 7)
+                for pos, ch in enumerate(w):
+                    raw[pos][ord(ch) - 97][byte] |= bit
+
+            self.words[length] = group
+            self.bits[length] = [[int.from_bytes(b, "little") for b in per_letter]
+                                 for per_letter in raw]
+            self.all[length] = (1 << len(group)) - 1
+
+    def mask(self, pattern):
+        length = len(pattern)
+        mask = self.all.get(length, 0)
+        if not mask:
+            return 0
+        bits = self.bits[length]
+        for pos, ch in enumerate(pattern.lower()):
+            if ch not in WILDCARDS:
+                k = ord(ch) - 97
+                if not 0 <= k < 26:
+                    return 0
+                mask &= bits[pos][k]
+                if not mask:
+                    break
+        return mask
+
+    def count(self, pattern):
+        return bin(self.mask(pattern)).count("1")
+
+    def matches(self, pattern, limit=None):
+        words = self.words.get(len(pattern), ())
+        found = []
+        mask = self.mask(pattern)
+        while mask and (limit is None or len(found) < limit):
+            low = mask & -mask
+            found.append(words[low.bit_length() - 1])
+            mask ^= low
+        return found
+
+    def sample(self, pattern, k, rng):
+        # Up to k random matches, without repeats. Never lists every match:
+        # when matches are dense, random word numbers are probed directly;
+        # otherwise the k are drawn from the next few matches after a random
+        # word number, wrapping around.
+        words = self.words.get(len(pattern), ())
+        mask = self.mask(pattern)
+        n = len(words)
+        if not mask:
+            return []
+
+        if bin(mask).count("1") * SAMPLE_DENSITY >= n:
+            picked = []
+            seen = set()
+            while len(picked) < k and len(seen) < n:
+                i = int(rng.random() * n)
+                if i not in seen:
+                    seen.add(i)
+                    if mask >> i & 1:
+                        picked.append(words[i])
+            return picked
+
+        start = int(rng.random() * n)
+        pool = k * SAMPLE_POOL
+        found = []
+        for part, offset in ((mask >> start, start), (mask & ((1 << start) - 1), 0)):
+            while part and len(found) < pool:
+                low = part & -part
+                found.append(words[offset + low.bit_length() - 1])
+                part ^= low
+        if len(found) <= k:
+            rng.shuffle(found)
+            return found
+        return rng.sample(found, k)
+
+    def __contains__(self, word):
+        return self.count(word) > 0
+
+    def __len__(self):
+        return sum(len(group) for group in self.words.values())
+
+
+_indexes = []
+
+
+def index_for(words):
+    # The PatternIndex for a word list, built on first use. A Lexicon holds
+    # on to its index; other lists share a cache of the INDEX_CACHE_SIZE
+    # most recently used.
+    if isinstance(words, Lexicon):
+        if words.pattern_index is None:
+            words.pattern_index = PatternIndex(words)
+        return words.pattern_index
+
+    for i, (cached_words, index) in enumerate(_indexes):
+        if cached_words is words:
+            _indexes.append(_indexes.pop(i))
+            return index
+    index = PatternIndex(words)
+    _indexes.append((words, index))
+    del _indexes[:-INDEX_CACHE_SIZE]
+    return index
@@ -0,0 +1,78 @@
+from array import array
+
+
+class Placement:
+    # One placed word: its answer, the row and column of its first letter
+    # and its direction ("H" or "V"). Unpacks like the
+    # (word, (row, col, direction)) tuples it replaces, so
+    # `for w, (r, c, d) in placed_words` keeps working, at about half the
+    # memory of the nested tuples.
+    __slots__ = ("word", "row", "col", "direction")
+
+    def __init__(self, word, row, col, direction):
+        self.word = word
+        self.row = row
+        self.col = col
+        self.direction = direction
+
+    @property
+    def pos(self):
+        return (self.row, self.col, self.direction)
+
+    def cells(self):
+        r, c = self.row, self.col
+        if self.direction == "H":
+            return [(r, c + i) for i in range(len(self.word))]
+        return [(r + i, c) for i in range(len(self.word))]
+
+    def __iter__(self):
+        yield self.word
+        yield (self.row, self.col, self.direction)
+
+    def __eq__(self, other):
+        if not isinstance(other, Placement):
+            return NotImplemented
+        return (self.word, self.row, self.col, self.direction) == (
+            other.word, other.row, other.col, other.direction)
+
+    def __hash__(self):
+        return hash((self.word, self.row, self.col, self.direction))
+
+    def __repr__(self):
+        return f"Placement({self.word!r}, {self.row}, {self.col}, {self.direction!r})"
+
+    def __reduce__(self):
+        # Pickles as a constructor call; much smaller than the slot state.
+        return (Placement, (self.word, self.row, self.col, self.direction))
+
+
+class WordMap:
+    # Which placed words run through each cell, by index into placed_words:
+    # one flat array for the across word and one for the down word, -1
+    # where there is none. Replaces a dict of lists keyed by (row, col).
+    __slots__ = ("rows", "cols", "across", "down")
+
+    def __init__(self, rows, cols, placed_words):
+        self.rows = rows
+        self.cols = cols
+        self.across = array("h", [-1]) * (rows * cols)
+        self.down = array("h", [-1]) * (rows * cols)
+        for i, (w, (r, c, d)) in enumerate(placed_words):
+            ids, step = (self.across, 1) if d == "H" else (self.down, cols)
+            base = r * cols + c
+            for k in range(len(w)):
+                ids[base + k * step] = i
+
+    def at(self, row, col):
+        # Word ids through a cell, across first; [] for a block or a cell
+        # off the grid.
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return []
+        k = row * self.cols + col
+        return [i for i in (self.across[k], self.down[k]) if i >= 0]
+
+    def __contains__(self, cell):
+        return bool(self.at(*cell))
+
+    def filled(self):
+        return sum(a >= 0 or d >= 0 for a, d in zip(self.across, self.down))
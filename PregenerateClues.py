@@ -0,0 +1,127 @@
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ClueGenerator import (
+    ClueCache,
+    StubClient,
+    _request_clues,
+    clue_token_budget,
+    get_clue_cache,
+)
+from Lexicon import Lexicon
+
+BATCH_SIZE = 40
+CONCURRENCY = 4
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 1.0
+
+
+def _fetch_batch(words, client, max_retries, backoff):
+    # Returns (clues, retries). Words the model skipped are retried along
+    # with failed requests; whatever is still missing after the last retry
+    # is simply left out.
+    clues = {}
+    pending = list(words)
+    retries = 0
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            retries += 1
+            time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random()))
+
+        try:
+            fetched = _request_clues(
+                pending, [], client=client,
+                max_output_tokens=clue_token_budget(len(pending)),
+            )
+        except Exception as e:
+            print(f"Batch of {len(pending)} failed (attempt {attempt + 1}):", e)
+            continue
+
+        requested = set(pending)
+        for w, clue in fetched.get("horizontal", {}).items():
+            if w.lower() in requested:
+                clues[w.lower()] = clue
+
+        pending = [w for w in pending if w not in clues]
+        if not pending:
+            break
+
+    return clues, retries
+
+
+def pregenerate_clues(word_file, cache=None, client=None, batch_size=BATCH_SIZE,
+                      concurrency=CONCURRENCY, max_retries=MAX_RETRIES,
+                      backoff=BACKOFF_SECONDS):
+    # Fills the clue cache for every word in `word_file` that isn't already
+    # in it, so the game can run with generate_clues(..., offline=True).
+    # Every clue for the word list is pinned, so the cache's TTL and size
+    # limit never drop them.
+    if cache is None:
+        cache = get_clue_cache()
+
+    words = list(Lexicon.load(word_file))
+    cached = cache.get_many(words)
+    cache.put_many(cached, pinned=True)
+    missing = [w for w in words if w not in cached]
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+
+    stats = {
+        "words": len(words),
+        "cached": len(cached),
+        "batches": len(batches),
+        "fetched": 0,
+        "missing": 0,
+        "retries": 0,
+    }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(_fetch_batch, batch, client, max_retries, backoff): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            clues, retries = future.result()
+            cache.put_many(clues, pinned=True)
+            stats["fetched"] += len(clues)
+            stats["missing"] += len(futures[future]) - len(clues)
+            stats["retries"] += retries
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate clues for a whole word file.")
+    parser.add_argument("words", nargs="?", default="5k.txt")
+    parser.add_argument("--db", default=None,
+                        help="clue database, kept without TTL or size limit "
+                             "(default: the game's clue cache)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--backoff", type=float, default=BACKOFF_SECONDS)
+    parser.add_argument("--stub", action="store_true", help="use the offline stub client")
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    cache = ClueCache(args.db, ttl=None, max_entries=None) if args.db else None
+    client = None
+    if args.stub:
+        client = StubClient(latency=args.stub_latency, failure_rate=args.stub_failure_rate)
+
+    start = time.perf_counter()
+    stats = pregenerate_clues(args.words, cache=cache, client=client,
+                              batch_size=args.batch_size, concurrency=args.concurrency,
+                              max_retries=args.retries, backoff=args.backoff)
+    elapsed = time.perf_counter() - start
+
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    print(f"elapsed: {elapsed:.2f}s ({stats['fetched'] / elapsed:.1f} words/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import queue
+import threading
+
+RETRY_DELAY = 1.0
+
+
+class PuzzlePool:
+    # Keeps up to `size` puzzles from make_puzzle() ready to hand out.
+    # A daemon thread refills the pool whenever a puzzle is taken.
+
+    def __init__(self, make_puzzle, size=3):
+        self._make_puzzle = make_puzzle
+        self._ready = queue.Queue(maxsize=size)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._refill, daemon=True)
+        self._thread.start()
+
+    def _refill(self):
+        while not self._stopped.is_set():
+            try:
+                puzzle = self._make_puzzle()
+            except Exception as e:
+                print("Error preparing pooled puzzle:", e)
+                self._stopped.wait(RETRY_DELAY)
+                continue
+
+            while not self._stopped.is_set():
+                try:
+                    self._ready.put(puzzle, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def get(self, timeout=None):
+        return self._ready.get(timeout=timeout)
+
+    def get_nowait(self):
+        # None when nothing is ready yet.
+        try:
+            return self._ready.get_nowait()
+        except queue.Empty:
+            return None
+
+    def __len__(self):
+        return self._ready.qsize()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,190 @@
+import json
+import os
+import struct
+import sys
+from array import array
+
+from Placement import Placement
+
+# A puzzle file is JSON Lines, one puzzle per line:
+#   {"id": 0, "rows": 15, "cols": 15, "grid": ["##CAT...", ...],
+#    "words": [["cat", 2, 2, "H", 1, "Feline pet"], ...], ...}
+# where each word is [answer, row, col, direction, clue number, clue or null].
+# Any other keys (seed, attempts, ...) are kept as they are.
+#
+# Next to it, "<file>.idx" holds the byte offset of every record so a
+# puzzle can be read by id with one seek: a header, then one
+# little-endian uint64 per record.
+INDEX_MAGIC = b"XWPI"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sIqQ")  # magic, version, data size, count
+
+
+def number_clues(placed_words):
+    # Standard crossword numbering: every cell that starts a word gets a
+    # number, counting row by row, left to right.
+    starts = sorted({(r, c) for _, (r, c, _) in placed_words})
+    return {rc: i + 1 for i, rc in enumerate(starts)}
+
+
+def encode_puzzle(grid, placed_words, clues=None, **extra):
+    numbers = number_clues(placed_words)
+    by_direction = {
+        "H": (clues or {}).get("horizontal", {}),
+        "V": (clues or {}).get("vertical", {}),
+    }
+
+    record = dict(extra)
+    record["rows"] = len(grid)
+    record["cols"] = len(grid[0]) if grid else 0
+    record["grid"] = ["".join(row) for row in grid]
+    record["words"] = [
+        [w, r, c, d, numbers[(r, c)], by_direction[d].get(w.lower())]
+        for w, (r, c, d) in placed_words
+    ]
+    return record
+
+
+def decode_puzzle(record):
+    # Back to the in-memory shape make_puzzle() returns. "clues" is None
+    # when the record carries no clue at all.
+    grid = [list(row) for row in record["grid"]]
+    placed_words = [Placement(w, r, c, d) for w, r, c, d, _, _ in record["words"]]
+
+    clues = {"horizontal": {}, "vertical": {}}
+    for w, _, _, d, _, clue in record["words"]:
+        if clue is not None:
+            clues["horizontal" if d == "H" else "vertical"][w.lower()] = clue
+    if not clues["horizontal"] and not clues["vertical"]:
+        clues = None
+
+    return {"grid": grid, "placed_words": placed_words, "clues": clues}
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def _write_index(path, offsets, data_size):
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, data_size, len(offsets)))
+        offsets = array("Q", offsets)
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        f.write(offsets.tobytes())
+    os.replace(tmp, index_path(path))
+
+
+def build_index(path):
+    # Scans a puzzle file and (re)writes its index; returns the offsets.
+    offsets = array("Q")
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                offsets.append(offset)
+            offset += len(line)
+    _write_index(path, offsets, offset)
+    return offsets
+
+
+def load_index(path):
+    # Offsets of every record in `path`, rebuilding the index if it is
+    # missing or doesn't match the file.
+    data_size = os.path.getsize(path)
+    try:
+        with open(index_path(path), "rb") as f:
+            buf = f.read()
+    except OSError:
+        return build_index(path)
+
+    if len(buf) < INDEX_HEADER.size:
+        return build_index(path)
+    magic, version, size, count = INDEX_HEADER.unpack_from(buf, 0)
+    if (magic != INDEX_MAGIC or version != INDEX_VERSION or size != data_size
+            or len(buf) != INDEX_HEADER.size + 8 * count):
+        return build_index(path)
+
+    offsets = array("Q", buf[INDEX_HEADER.size:])
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return offsets
+
+
+class PuzzleWriter:
+    # Appends puzzle records to a file and keeps its index in step.
+    # Use as a context manager; the index is written on close().
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self._offsets = array("Q")
+        if append and os.path.exists(path):
+            self._offsets = load_index(path)
+        self._f = open(path, "ab" if append else "wb")
+
+    def write(self, puzzle):
+        # `puzzle` is an encoded record; its id is its position in the file.
+        puzzle = dict(puzzle, id=len(self._offsets))
+        self._offsets.append(self._f.tell())
+        self._f.write(json.dumps(puzzle, separators=(",", ":")).encode("utf-8") + b"\n")
+        return puzzle["id"]
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.flush()
+        size = self._f.tell()
+        self._f.close()
+        _write_index(self.path, self._offsets, size)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PuzzleReader:
+    # Random access to a puzzle file by id through its index, which is
+    # rebuilt if missing or out of date. Indexing and iterating give decoded
+    # puzzles; read() and records() give the stored records.
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        self._offsets = load_index(path)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def read(self, puzzle_id):
+        # The stored record, as written.
+        self._f.seek(self._offsets[puzzle_id])
+        return json.loads(self._f.readline())
+
+    def __getitem__(self, puzzle_id):
+        return decode_puzzle(self.read(puzzle_id))
+
+    def records(self):
+        # Every stored record, streamed in file order.
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def __iter__(self):
+        for record in self.records():
+            yield decode_puzzle(record)
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,422 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from BatchGenerate import _init_worker, generate_puzzle
+from ClueGenerator import ClueCache, StubClient, generate_clues, get_clue_cache
+from Main import GENERATOR_MODE
+
+HOST = "127.0.0.1"
+PORT = 8765
+QUEUE_SIZE = 64
+CLUE_THREADS = 8
+MAX_BODY = 64 * 1024
+MAX_BEST_OF = 32
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Endpoints (JSON in and out; streamed responses are chunked NDJSON):
+#   GET  /puzzle?seed=&mode=&best_of=   one generated puzzle, in the
+#                                       PuzzleStore record format
+#   GET  /puzzle?...&clues=1            streams the puzzle, then its clues
+#                                       as they arrive, then {"done": true}
+#   POST /clues {"horizontal": [...], "vertical": [...]}
+#                                       streams clues, then {"done": true}
+#   GET  /stats                         queue and coalescing counters
+#   GET  /health
+
+
+class HttpError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class GenerationQueue:
+    # Bounded queue in front of the generation process pool. One dispatcher
+    # per worker process keeps the pool busy; once `size` jobs are waiting,
+    # submit() fails fast with a 503 instead of letting latency grow.
+
+    def __init__(self, executor, workers, size=QUEUE_SIZE):
+        self._executor = executor
+        self._workers = workers
+        self._queue = asyncio.Queue(maxsize=size)
+        self._tasks = []
+        self.rejected = 0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self._workers)]
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future = await self._queue.get()
+            try:
+                if not future.cancelled():
+                    result = await loop.run_in_executor(self._executor, job)
+                    if not future.cancelled():
+                        future.set_result(result)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, job):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HttpError(503, "generation queue is full")
+        return future
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+
+class _ClueRun:
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.wakeup = asyncio.Event()
+
+
+class ClueCoalescer:
+    # Identical clue requests that overlap in time share one generate_clues
+    # call. Every subscriber gets every partial result, including the ones
+    # sent before it joined.
+
+    def __init__(self, clue_fn, executor):
+        self._clue_fn = clue_fn
+        self._executor = executor
+        self._runs = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def subscribe(self, horizontal_words, vertical_words):
+        key = (tuple(sorted(horizontal_words)), tuple(sorted(vertical_words)))
+        run = self._runs.get(key)
+        if run is None:
+            run = self._runs[key] = _ClueRun()
+            self.started += 1
+            asyncio.create_task(self._run(key, run, list(key[0]), list(key[1])))
+        else:
+            self.coalesced += 1
+
+        i = 0
+        while True:
+            while i < len(run.parts):
+                yield run.parts[i]
+                i += 1
+            if run.done:
+                break
+            await run.wakeup.wait()
+
+        if run.error is not None:
+            raise RuntimeError(run.error)
+
+    def _push(self, run, part):
+        run.parts.append(part)
+        self._wake(run)
+
+    def _wake(self, run):
+        run.wakeup.set()
+        run.wakeup = asyncio.Event()
+
+    async def _run(self, key, run, horizontal_words, vertical_words):
+        loop = asyncio.get_running_loop()
+
+        def on_partial(part):
+            loop.call_soon_threadsafe(self._push, run, part)
+
+        try:
+            await loop.run_in_executor(
+                self._executor,
+                partial(self._clue_fn, horizontal_words, vertical_words, on_partial=on_partial))
+        except Exception as e:
+            run.error = str(e) or type(e).__name__
+        finally:
+            del self._runs[key]
+            run.done = True
+            self._wake(run)
+
+    def __len__(self):
+        return len(self._runs)
+
+
+async def read_request(reader):
+    # (method, target, headers, body), or None once the client is done.
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HttpError(400, "bad Content-Length")
+    if length < 0 or length > MAX_BODY:
+        raise HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def _head(status, content_type, extra):
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}"]
+    lines += [f"{name}: {value}" for name, value in extra]
+    return ("\r\n".join(lines) + "\r\n").encode("latin-1")
+
+
+async def send_json(writer, status, payload, headers=()):
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    writer.write(_head(status, "application/json",
+                       [("Content-Length", len(body)), *headers]) + b"\r\n" + body)
+    await writer.drain()
+
+
+class NdjsonStream:
+    # Chunked response carrying one JSON object per line, each flushed to
+    # the client as soon as it is sent.
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    async def start(self):
+        self._writer.write(_head(200, "application/x-ndjson",
+                                 [("Transfer-Encoding", "chunked")]) + b"\r\n")
+        await self._writer.drain()
+
+    async def send(self, obj):
+        data = json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n"
+        self._writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await self._writer.drain()
+
+    async def end(self):
+        self._writer.write(b"0\r\n\r\n")
+        await self._writer.drain()
+
+
+class CrosswordServer:
+
+    def __init__(self, generation, clues):
+        self.generation = generation
+        self.clues = clues
+        self.requests = 0
+        self.started = time.time()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    await send_json(writer, e.status, {"error": e.message},
+                                    [("Connection", "close")])
+                    break
+                if request is None:
+                    break
+
+                method, target, headers, body = request
+                self.requests += 1
+                try:
+                    await self.route(method, target, body, writer)
+                except HttpError as e:
+                    extra = [("Retry-After", 1)] if e.status == 503 else []
+                    await send_json(writer, e.status, {"error": e.message}, extra)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # A failed job (worker crash, broken pool, ...) still
+                    # gets the client an answer.
+                    print(f"Error handling {method} {target}:", repr(e))
+                    await send_json(writer, 500, {"error": "internal error"})
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body, writer):
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            await send_json(writer, 200, {"ok": True})
+        elif url.path == "/stats":
+            await send_json(writer, 200, self.stats())
+        elif url.path == "/puzzle":
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            await self.puzzle(query, writer)
+        elif url.path == "/clues":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            await self.clue_stream(body, writer)
+        else:
+            raise HttpError(404, "not found")
+
+    async def puzzle(self, query, writer):
+        try:
+            seed = int(query["seed"]) if "seed" in query else time.time_ns()
+            best_of = min(MAX_BEST_OF, max(1, int(query.get("best_of", 1))))
+        except ValueError:
+            raise HttpError(400, "seed and best_of must be integers")
+        mode = query.get("mode", GENERATOR_MODE)
+        if mode not in ("greedy", "backtrack", "fill"):
+            raise HttpError(400, "mode must be greedy, backtrack or fill")
+
+        job = partial(generate_puzzle, seed, mode=mode, best_of=best_of)
+        record = await self.generation.submit(job)
+
+        if query.get("clues") not in ("1", "true"):
+            await send_json(writer, 200, record)
+            return
+
+        stream = NdjsonStream(writer)
+        await stream.start()
+        await stream.send(record)
+        horizontal_words = [w for w, _, _, d, _, _ in record["words"] if d == "H"]
+        vertical_words = [w for w, _, _, d, _, _ in record["words"] if d == "V"]
+        await self._stream_clues(stream, horizontal_words, vertical_words)
+
+    async def clue_stream(self, body, writer):
+        try:
+            request = json.loads(body or b"{}")
+            horizontal_words = [str(w).lower() for w in request.get("horizontal", [])]
+            vertical_words = [str(w).lower() for w in request.get("vertical", [])]
+        except (ValueError, AttributeError, TypeError):
+            raise HttpError(400, 'expected {"horizontal": [...], "vertical": [...]}')
+
+        stream = NdjsonStream(writer)
+        await stream.start()
+        await self._stream_clues(stream, horizontal_words, vertical_words)
+
+    async def _stream_clues(self, stream, horizontal_words, vertical_words):
+        # Headers are already out, so a failure is reported in the stream.
+        try:
+            async for part in self.clues.subscribe(horizontal_words, vertical_words):
+                await stream.send(part)
+        except RuntimeError as e:
+            await stream.send({"done": True, "error": str(e)})
+        else:
+            await stream.send({"done": True})
+        await stream.end()
+
+    def stats(self):
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "generation_queued": len(self.generation),
+            "generation_rejected": self.generation.rejected,
+            "clue_runs_in_flight": len(self.clues),
+            "clue_runs_started": self.clues.started,
+            "clue_requests_coalesced": self.clues.coalesced,
+        }
+
+
+async def serve(word_file="5k.txt", host=HOST, port=PORT, workers=None,
+                queue_size=QUEUE_SIZE, clue_fn=None, ready=None):
+    # Runs until cancelled. `ready`, if given, is set once the socket listens.
+    if clue_fn is None:
+        clue_fn = generate_clues
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(word_file,)) as processes, \
+            ThreadPoolExecutor(max_workers=CLUE_THREADS) as threads:
+        generation = GenerationQueue(processes, workers, queue_size)
+        generation.start()
+        app = CrosswordServer(generation, ClueCoalescer(clue_fn, threads))
+
+        # SIGTERM cancels serving like Ctrl-C does, so both pools get shut
+        # down instead of leaving worker processes behind.
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, task.cancel)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        server = await asyncio.start_server(app.handle, host, port)
+        print(f"Serving on http://{host}:{port}", flush=True)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            generation.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crossword generation and clue HTTP service.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("-w", "--words", default="5k.txt")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--db", default=None, help="clue database (default: the game's clue cache)")
+    parser.add_argument("--stub", action="store_true",
+                        help="answer clue requests with the offline stub client")
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    client = None
+    if args.stub:
+        client = StubClient(latency=args.stub_latency, failure_rate=args.stub_failure_rate)
+    if args.db:
+        cache = ClueCache(args.db)
+    elif args.stub:
+        # Stub clues shouldn't end up in the game's clue cache.
+        cache = ClueCache(":memory:")
+    else:
+        cache = get_clue_cache()
+    clue_fn = partial(generate_clues, cache=cache, client=client)
+
+    try:
+        asyncio.run(serve(args.words, args.host, args.port, args.workers,
+                          args.queue_size, clue_fn))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
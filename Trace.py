@@ -0,0 +1,127 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Set CROSSWORD_TRACE to a file path (or "-" for stderr) to record timings
+# and counters as JSON Lines, one object per span or event:
+#   {"t": 0.153, "pid": 4242, "name": "generate_crossword", "ms": 2.71, ...}
+# "t" is seconds since the trace started. Counters are written as a
+# "counters" event by flush_counters(), at the end of each worker job and
+# when the process exits (pool workers never get that far). Each event
+# holds the counts since the previous one, so add them up across events.
+#
+# Tracing is off by default. Hot paths check `Trace.enabled` before doing
+# any work, so a disabled trace costs one attribute lookup.
+TRACE_ENV = "CROSSWORD_TRACE"
+
+enabled = False
+
+_out = None
+_start = time.perf_counter()
+_lock = threading.Lock()
+_counters = {}
+
+
+def configure(path):
+    # Starts writing to `path` ("-" for stderr); None turns tracing off.
+    global enabled, _out, _start
+    with _lock:
+        if _out is not None and _out is not sys.stderr:
+            _out.close()
+        _out = None
+        enabled = False
+        if path:
+            _out = sys.stderr if path == "-" else open(path, "a", buffering=1)
+            _start = time.perf_counter()
+            enabled = True
+
+
+def event(name, **fields):
+    if not enabled:
+        return
+    record = {"t": round(time.perf_counter() - _start, 6), "pid": os.getpid(), "name": name}
+    record.update(fields)
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if _out is not None:
+            _out.write(line)
+
+
+def count(name, n=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+class _Span:
+    __slots__ = ("name", "fields", "t0")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self.fields
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.t0) * 1000
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        event(self.name, ms=round(ms, 3), **self.fields)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **fields):
+    # Times a with-block and emits it as one event. The block can add
+    # fields to the dict it gets from `as`.
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, fields)
+
+
+def timed(name):
+    # Decorator form of span() for whole functions.
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def flush_counters():
+    # Writes the counters as one event and starts them again from zero.
+    with _lock:
+        counters = dict(_counters)
+        _counters.clear()
+    if counters:
+        event("counters", **counters)
+
+
+atexit.register(flush_counters)
+# A forked worker starts from zero rather than recounting its parent's.
+os.register_at_fork(after_in_child=_counters.clear)
+
+if os.environ.get(TRACE_ENV):
+    configure(os.environ[TRACE_ENV])